@@ -1,24 +1,43 @@
 # app/__init__.py
 
 from flask import Flask
-from config import Config
+from config import config_from_env
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
+from app.replicas import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 login_manager = LoginManager()
 login_manager.login_view = 'auth.login'  # Specify the login view
 
-def create_app(config_class=Config):
+def create_app(config_class=None):
     app = Flask(__name__)
-    app.config.from_object(config_class)
+    app.config.from_object(config_class or config_from_env())
 
     db.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
 
+    from app import (metrics, profiler, serialization, compression, database, replicas, geo, geocoding, availability,
+                     stats, cache, versioning, events, search, facets)
+    metrics.init_app(app)
+    profiler.init_app(app)
+    serialization.init_app(app)
+    compression.init_app(app)
+    database.init_app(app)
+    replicas.init_app(app)
+    geo.init_app(app)
+    geocoding.init_app(app)
+    availability.init_app(app)
+    stats.init_app(app)
+    cache.init_app(app)
+    versioning.init_app(app)
+    events.init_app(app)
+    search.init_app(app)
+    facets.init_app(app)
+
     # Register blueprints
     from app.main import bp as main_bp
     app.register_blueprint(main_bp)
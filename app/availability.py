@@ -0,0 +1,243 @@
+# app/availability.py
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from flask import current_app
+from sqlalchemy import event, inspect, select, update, insert, delete, literal
+from app import db
+from app.database import upsert
+
+# Reservation statuses that take up seats
+OCCUPYING_STATUSES = ('pending', 'accepted')
+
+
+class CapacityExceeded(Exception):
+    """Raised during flush when a reservation would overbook a slot. The transaction must be rolled back."""
+
+    def __init__(self, restaurant_id, slot_start):
+        super().__init__(f'Restaurant {restaurant_id} has no seats left at {slot_start}')
+        self.restaurant_id = restaurant_id
+        self.slot_start = slot_start
+
+
+def slot_floor(moment, slot_minutes):
+    """Start of the slot containing moment."""
+    minutes = (moment.hour * 60 + moment.minute) // slot_minutes * slot_minutes
+    return datetime.combine(moment.date(), time()) + timedelta(minutes=minutes)
+
+
+def occupied_slots(start, slot_minutes, dining_minutes):
+    """Starts of every slot a reservation beginning at start takes up."""
+    end = start + timedelta(minutes=dining_minutes)
+    slot = slot_floor(start, slot_minutes)
+    slots = []
+    while slot < end:
+        slots.append(slot)
+        slot += timedelta(minutes=slot_minutes)
+    return slots
+
+
+def _value_before_flush(state, key):
+    history = state.attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    return state.attrs[key].value
+
+
+def reservation_contributions(session):
+    """
+    What the reservations being flushed add to or remove from per-slot aggregates,
+    as (restaurant_id, reservation_datetime, person_count, status, sign) tuples:
+    inserts add, deletes remove, and updates to status, party size, time or
+    restaurant remove the old values and add the new ones.
+    """
+    from app.models import Reservation
+
+    keys = ('restaurant_id', 'reservation_datetime', 'person_count', 'status')
+    contributions = []
+    for obj in session.new:
+        if isinstance(obj, Reservation):
+            contributions.append((obj.restaurant_id, obj.reservation_datetime, obj.person_count, obj.status, 1))
+    for obj in session.deleted:
+        if isinstance(obj, Reservation):
+            state = inspect(obj)
+            contributions.append(tuple(_value_before_flush(state, key) for key in keys) + (-1,))
+    for obj in session.dirty:
+        if not isinstance(obj, Reservation):
+            continue
+        state = inspect(obj)
+        if not any(state.attrs[key].history.has_changes() for key in keys):
+            continue
+        contributions.append(tuple(_value_before_flush(state, key) for key in keys) + (-1,))
+        contributions.append((obj.restaurant_id, obj.reservation_datetime, obj.person_count, obj.status, 1))
+    return contributions
+
+
+def occupancy_deltas(session, contributions):
+    """Net change in covers per (restaurant_id, slot_start) for the given contributions."""
+    from app.models import Restaurant
+
+    contributions = [
+        (restaurant_id, start, person_count, sign)
+        for restaurant_id, start, person_count, status, sign in contributions
+        if status in OCCUPYING_STATUSES
+    ]
+    deltas = defaultdict(int)
+    if not contributions:
+        return deltas
+
+    restaurant_ids = {restaurant_id for restaurant_id, _, _, _ in contributions}
+    settings = {
+        row.id: row for row in session.connection().execute(
+            select(Restaurant.id, Restaurant.slot_minutes, Restaurant.dining_minutes)
+            .where(Restaurant.id.in_(restaurant_ids))
+        )
+    }
+    for restaurant_id, start, person_count, sign in contributions:
+        restaurant = settings.get(restaurant_id)
+        if restaurant is None:
+            continue
+        for slot in occupied_slots(start, restaurant.slot_minutes, restaurant.dining_minutes):
+            deltas[(restaurant_id, slot)] += sign * int(person_count)
+    return deltas
+
+
+def apply_deltas(connection, deltas):
+    """
+    Apply per-slot deltas. Seats are taken with an INSERT ... ON CONFLICT DO UPDATE
+    whose update only applies while covers + delta still fits seat_capacity, so
+    concurrent bookings can never overbook a slot, whatever the number of workers,
+    and concurrent first bookings of an empty slot add up instead of colliding on the
+    primary key. Raises CapacityExceeded if a slot is full.
+
+    Seats given back never create a row or take covers below zero: a slot that holds
+    fewer covers than are released means the index drifted (e.g. reservations that
+    predate it), so it is clamped to zero and logged.
+    """
+    from app.models import Restaurant, SlotOccupancy
+    for (restaurant_id, slot_start), delta in deltas.items():
+        if not delta:
+            continue
+        if delta < 0:
+            slot = (SlotOccupancy.restaurant_id == restaurant_id, SlotOccupancy.slot_start == slot_start)
+            released = update(SlotOccupancy).where(*slot, SlotOccupancy.covers + delta >= 0)
+            if connection.execute(released.values(covers=SlotOccupancy.covers + delta)).rowcount == 0:
+                current_app.logger.warning(
+                    f'slot_occupancy of restaurant {restaurant_id} at {slot_start} is behind by more than '
+                    f'{-delta} covers; clamped to 0 (run flask rebuild-occupancy)'
+                )
+                connection.execute(update(SlotOccupancy).where(*slot).values(covers=0))
+            continue
+
+        capacity = select(Restaurant.seat_capacity).where(Restaurant.id == restaurant_id).scalar_subquery()
+        # The SELECT yields no row when delta alone exceeds the capacity
+        claim = upsert(connection, SlotOccupancy.__table__).from_select(
+            ['restaurant_id', 'slot_start', 'covers'],
+            select(literal(restaurant_id), literal(slot_start, SlotOccupancy.slot_start.type), literal(delta))
+            .where(Restaurant.id == restaurant_id, Restaurant.seat_capacity >= delta)
+        )
+        claim = claim.on_conflict_do_update(
+            index_elements=['restaurant_id', 'slot_start'],
+            set_={'covers': SlotOccupancy.covers + claim.excluded.covers},
+            where=SlotOccupancy.covers + claim.excluded.covers <= capacity
+        )
+        if connection.execute(claim).rowcount != 1:
+            raise CapacityExceeded(restaurant_id, slot_start)
+
+
+def _after_flush(session, flush_context):
+    # Same connection and transaction as the flush, so the index commits or rolls back with it
+    apply_deltas(session.connection(), occupancy_deltas(session, reservation_contributions(session)))
+
+
+def opening_hours_for(restaurant, day):
+    """(opens_at, closes_at) of a restaurant on a date, or None if closed that day."""
+    if restaurant.opening_hours:
+        for hours in restaurant.opening_hours:
+            if hours.weekday == day.weekday():
+                return hours.opens_at, hours.closes_at
+        return None
+    opens_at, closes_at = current_app.config['DEFAULT_OPENING_HOURS']
+    return time.fromisoformat(opens_at), time.fromisoformat(closes_at)
+
+
+def within_opening_hours(restaurant, start):
+    """True if a reservation starting at start opens no earlier than opening time and ends by closing."""
+    hours = opening_hours_for(restaurant, start.date())
+    if hours is None:
+        return False
+    opens_at = datetime.combine(start.date(), hours[0])
+    closes_at = datetime.combine(start.date(), hours[1])
+    return opens_at <= start <= closes_at - timedelta(minutes=restaurant.dining_minutes)
+
+
+def available_slots(restaurant, day, party_size):
+    """
+    Slots on day where a party of party_size can start dining: every slot the party
+    would take up must have enough free seats, and dining must end by closing time.
+    Reads only the precomputed slot_occupancy rows for that day.
+    """
+    from app.models import SlotOccupancy
+
+    hours = opening_hours_for(restaurant, day)
+    if hours is None:
+        return []
+    opens_at = datetime.combine(day, hours[0])
+    closes_at = datetime.combine(day, hours[1])
+
+    covers = dict(db.session.execute(
+        select(SlotOccupancy.slot_start, SlotOccupancy.covers).where(
+            SlotOccupancy.restaurant_id == restaurant.id,
+            SlotOccupancy.slot_start >= opens_at,
+            SlotOccupancy.slot_start < closes_at
+        )
+    ).all())
+
+    slots = []
+    start = slot_floor(opens_at, restaurant.slot_minutes)
+    last_start = closes_at - timedelta(minutes=restaurant.dining_minutes)
+    while start <= last_start:
+        needed = occupied_slots(start, restaurant.slot_minutes, restaurant.dining_minutes)
+        seats_left = min(restaurant.seat_capacity - covers.get(slot, 0) for slot in needed)
+        if start >= opens_at and seats_left >= party_size:
+            slots.append({'time': start.strftime('%H:%M'), 'seatsLeft': seats_left})
+        start += timedelta(minutes=restaurant.slot_minutes)
+    return slots
+
+
+def rebuild_occupancy():
+    """Recompute slot_occupancy from the reservations table (backfill, or after slot settings change)."""
+    from app.models import Reservation, Restaurant, SlotOccupancy
+
+    settings = {row.id: row for row in db.session.execute(
+        select(Restaurant.id, Restaurant.slot_minutes, Restaurant.dining_minutes)
+    )}
+    deltas = defaultdict(int)
+    rows = db.session.execute(
+        select(Reservation.restaurant_id, Reservation.reservation_datetime, Reservation.person_count)
+        .where(Reservation.status.in_(OCCUPYING_STATUSES))
+        .execution_options(yield_per=5000)
+    )
+    for restaurant_id, start, person_count in rows:
+        restaurant = settings[restaurant_id]
+        for slot in occupied_slots(start, restaurant.slot_minutes, restaurant.dining_minutes):
+            deltas[(restaurant_id, slot)] += person_count
+
+    db.session.execute(delete(SlotOccupancy))
+    if deltas:
+        db.session.execute(insert(SlotOccupancy), [
+            {'restaurant_id': restaurant_id, 'slot_start': slot_start, 'covers': covers}
+            for (restaurant_id, slot_start), covers in deltas.items()
+        ])
+    db.session.commit()
+    return len(deltas)
+
+
+def init_app(app):
+    if not event.contains(db.session, 'after_flush', _after_flush):
+        event.listen(db.session, 'after_flush', _after_flush)
+
+    @app.cli.command('rebuild-occupancy')
+    def rebuild_occupancy_command():
+        """Rebuild the per-slot occupancy index from all reservations."""
+        print(f'Rebuilt {rebuild_occupancy()} slot occupancy rows.')
@@ -0,0 +1,190 @@
+# app/bulk.py
+
+import json
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import select, insert
+from app import db
+from app.availability import OCCUPYING_STATUSES, occupied_slots, apply_deltas
+from app.stats import rollup_deltas, apply_rollup
+from app.cache import invalidate_on_commit
+from app.models import Reservation, Restaurant, FrontendUser, SlotOccupancy
+
+REQUIRED_FIELDS = ('restaurant_id', 'name', 'date', 'time', 'number_of_people', 'timestamp', 'user_id')
+IMPORT_STATUSES = ('pending', 'accepted', 'declined', 'no_show')
+
+
+def parse_payload(body, content_type):
+    """Rows from a JSON array or JSON Lines body. Raises ValueError on malformed input."""
+    text = body.decode('utf-8').strip()
+    if 'ndjson' in content_type or 'jsonlines' in content_type or not text.startswith('['):
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    rows = json.loads(text)
+    if not isinstance(rows, list):
+        raise ValueError('Expected a JSON array.')
+    return rows
+
+
+def validate_row(data):
+    """Return (values, None) for a valid reservation row, or (None, error message)."""
+    if not isinstance(data, dict) or not all(data.get(field) for field in REQUIRED_FIELDS):
+        return None, 'Missing required fields.'
+    try:
+        reservation_datetime = datetime.strptime(f"{data['date']} {data['time']}", "%Y-%m-%d %H:%M")
+    except (TypeError, ValueError):
+        return None, 'Invalid date or time format.'
+    try:
+        timestamp = datetime.fromisoformat(str(data['timestamp']).replace('Z', '+00:00'))
+    except ValueError:
+        return None, 'Invalid timestamp format.'
+    try:
+        person_count = int(data['number_of_people'])
+        restaurant_id = int(data['restaurant_id'])
+    except (TypeError, ValueError):
+        return None, 'Invalid number of people or restaurant id.'
+    status = data.get('status', 'pending')
+    if person_count < 1 or status not in IMPORT_STATUSES:
+        return None, 'Invalid number of people or status.'
+    return {
+        'restaurant_id': restaurant_id,
+        'name': str(data['name'])[:100],
+        'reservation_datetime': reservation_datetime,
+        'timestamp': timestamp,
+        'person_count': person_count,
+        'status': status,
+        'user_id': str(data['user_id']),
+    }, None
+
+
+def _resolve_frontend_users(user_ids):
+    """Map frontend user_id strings to FrontendUser.id, creating missing users. Two statements at most."""
+    existing = dict(db.session.execute(
+        select(FrontendUser.user_id, FrontendUser.id).where(FrontendUser.user_id.in_(user_ids))
+    ).all())
+    missing = [{'user_id': user_id} for user_id in user_ids if user_id not in existing]
+    if missing:
+        created = db.session.execute(
+            insert(FrontendUser).returning(FrontendUser.user_id, FrontendUser.id, sort_by_parameter_order=True),
+            missing
+        )
+        existing.update(dict(created.all()))
+    return existing
+
+
+def import_reservations(rows):
+    """
+    Validate, admit and insert a batch of reservations in one transaction.
+
+    Restaurants and frontend users are resolved with one IN query each; rows are
+    admitted against the slot occupancy index in order, so a row that would overbook
+    a slot is rejected while the rest of the batch goes through. Reservations are
+    inserted with a single executemany. Returns one result dict per input row.
+    Raises CapacityExceeded or IntegrityError if a concurrent writer raced the batch;
+    the caller rolls back and retries.
+    """
+    results = [None] * len(rows)
+    valid = []
+    for index, data in enumerate(rows):
+        values, error = validate_row(data)
+        if error:
+            results[index] = {'index': index, 'status': 'error', 'error': error}
+        else:
+            valid.append((index, values))
+
+    restaurant_ids = {values['restaurant_id'] for _, values in valid}
+    restaurants = {row.id: row for row in db.session.execute(
+        select(Restaurant.id, Restaurant.seat_capacity, Restaurant.slot_minutes, Restaurant.dining_minutes)
+        .where(Restaurant.id.in_(restaurant_ids))
+    )}
+
+    # Current occupancy of every slot the batch touches, one query per restaurant
+    slots_by_row = {}
+    wanted = defaultdict(set)
+    for index, values in valid:
+        restaurant = restaurants.get(values['restaurant_id'])
+        if restaurant is None:
+            continue
+        slots = occupied_slots(values['reservation_datetime'], restaurant.slot_minutes, restaurant.dining_minutes)
+        slots_by_row[index] = slots
+        wanted[restaurant.id].update(slots)
+    covers = {}
+    for restaurant_id, slots in wanted.items():
+        for slot_start, slot_covers in db.session.execute(
+            select(SlotOccupancy.slot_start, SlotOccupancy.covers).where(
+                SlotOccupancy.restaurant_id == restaurant_id,
+                SlotOccupancy.slot_start >= min(slots),
+                SlotOccupancy.slot_start <= max(slots)
+            )
+        ):
+            covers[(restaurant_id, slot_start)] = slot_covers
+
+    admitted = []
+    deltas = defaultdict(int)
+    for index, values in valid:
+        restaurant = restaurants.get(values['restaurant_id'])
+        if restaurant is None:
+            results[index] = {'index': index, 'status': 'error', 'error': 'Restaurant not found.'}
+            continue
+        if values['status'] in OCCUPYING_STATUSES:
+            keys = [(restaurant.id, slot) for slot in slots_by_row[index]]
+            if any(covers.get(key, 0) + values['person_count'] > restaurant.seat_capacity for key in keys):
+                results[index] = {'index': index, 'status': 'error', 'error': 'No seats available for the selected time.'}
+                continue
+            for key in keys:
+                covers[key] = covers.get(key, 0) + values['person_count']
+                deltas[key] += values['person_count']
+        admitted.append((index, values))
+
+    if admitted:
+        frontend_user_ids = _resolve_frontend_users(sorted({values['user_id'] for _, values in admitted}))
+        inserted = db.session.execute(
+            insert(Reservation).returning(Reservation.id, sort_by_parameter_order=True),
+            [{
+                'restaurant_id': values['restaurant_id'],
+                'name': values['name'],
+                'reservation_datetime': values['reservation_datetime'],
+                'timestamp': values['timestamp'],
+                'person_count': values['person_count'],
+                'status': values['status'],
+                'frontend_user_id': frontend_user_ids[values['user_id']],
+            } for _, values in admitted]
+        ).scalars().all()
+        for (index, _), reservation_id in zip(admitted, inserted):
+            results[index] = {'index': index, 'status': 'created', 'reservation_id': reservation_id}
+        # Core inserts bypass the flush listeners, so keep the occupancy index and rollup in step here
+        apply_deltas(db.session.connection(), deltas)
+        apply_rollup(db.session.connection(), rollup_deltas(
+            (values['restaurant_id'], values['reservation_datetime'], values['person_count'], values['status'], 1)
+            for _, values in admitted
+        ))
+        invalidate_on_commit(db.session, {f"reservations:{values['restaurant_id']}" for _, values in admitted})
+
+    db.session.commit()
+    return results
+
+
+def export_rows(restaurant_id=None, status=None, since=None, batch_size=1000):
+    """Yield reservations as dicts from a server-side cursor, batch_size rows per fetch."""
+    query = select(
+        Reservation.id, Reservation.restaurant_id, Reservation.name, Reservation.reservation_datetime,
+        Reservation.timestamp, Reservation.person_count, Reservation.status, FrontendUser.user_id
+    ).outerjoin(FrontendUser, Reservation.frontend_user_id == FrontendUser.id).order_by(Reservation.id)
+    if restaurant_id is not None:
+        query = query.where(Reservation.restaurant_id == restaurant_id)
+    if status is not None:
+        query = query.where(Reservation.status == status)
+    if since is not None:
+        query = query.where(Reservation.timestamp >= since)
+
+    result = db.session.execute(query.execution_options(stream_results=True, yield_per=batch_size))
+    for row in result:
+        yield {
+            'reservation_id': row.id,
+            'restaurant_id': row.restaurant_id,
+            'name': row.name,
+            'reservation_datetime': row.reservation_datetime.isoformat(),
+            'timestamp': row.timestamp.isoformat(),
+            'person_count': row.person_count,
+            'status': row.status,
+            'user_id': row.user_id,
+        }
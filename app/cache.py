@@ -0,0 +1,255 @@
+# app/cache.py
+
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request, g, has_app_context
+from sqlalchemy import event, inspect
+from werkzeug.utils import import_string
+from app import db
+
+
+class MemoryCache:
+    """
+    In-process LRU cache with a size bound and a TTL. Every entry carries a set of
+    tags; invalidate(tags) drops all entries holding any of them.
+    """
+
+    def __init__(self, config):
+        self.max_entries = config['RESPONSE_CACHE_MAX_ENTRIES']
+        self.ttl = config['RESPONSE_CACHE_TTL']
+        self.entries = OrderedDict()  # key -> (expires_at, tags, value)
+        self.keys_by_tag = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._drop(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, key, value, tags):
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = (time.monotonic() + self.ttl, tags, value)
+            for tag in tags:
+                self.keys_by_tag.setdefault(tag, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._drop(next(iter(self.entries)))
+
+    def invalidate(self, tags):
+        with self.lock:
+            for tag in tags:
+                for key in list(self.keys_by_tag.get(tag, ())):
+                    self._drop(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.keys_by_tag.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _drop(self, key):
+        _, tags, _ = self.entries.pop(key)
+        for tag in tags:
+            keys = self.keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.keys_by_tag[tag]
+
+
+class NullCache:
+    """Caches nothing; disables response caching."""
+
+    def __init__(self, config):
+        pass
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, tags):
+        pass
+
+    def invalidate(self, tags):
+        pass
+
+    def clear(self):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+CACHE_BACKENDS = {
+    'memory': MemoryCache,
+    'null': NullCache,
+}
+
+
+class ResponseCache:
+    """
+    Caches GET responses of read endpoints, keyed by endpoint and arguments.
+
+    Views tag what they serialize (see add_cache_tags); committed writes to
+    restaurants, categories, restaurant_categories and reservations invalidate the
+    matching tags. A response built while an invalidation happened is not stored,
+    so a read that raced a commit can never repopulate the cache with stale data.
+    The counters are shared by all request threads and only change under lock.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.invalidated_at = float('-inf')  # time.monotonic() of the last invalidation
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def invalidate(self, tags):
+        if tags:
+            with self.lock:
+                self.generation += 1
+                self.invalidated_at = time.monotonic()
+                self.invalidations += 1
+            self.backend.invalidate(tags)
+
+    def count_hit(self):
+        with self.lock:
+            self.hits += 1
+
+    def count_miss(self):
+        with self.lock:
+            self.misses += 1
+
+    def stats(self):
+        with self.lock:
+            counters = {'hits': self.hits, 'misses': self.misses, 'invalidations': self.invalidations}
+        return {**counters, 'entries': len(self.backend)}
+
+
+def get_response_cache():
+    return current_app.extensions['response_cache']
+
+
+def add_cache_tags(*tags):
+    """Tag the response being built, so writes touching these tags evict it."""
+    g.setdefault('cache_tags', set()).update(tags)
+
+
+def restaurant_tags(restaurants):
+    """Tags for serialized restaurants: each restaurant and the category names it lists."""
+    tags = []
+    for restaurant in restaurants:
+        tags.append(f'restaurant:{restaurant.id}')
+        tags.extend(f'category:{category.id}' for category in restaurant.categories)
+    return tags
+
+
+def cached_response(view):
+    """
+    Serve a GET view from the response cache. Only complete 200 responses are stored.
+    A response read from a replica is stored only when nothing was invalidated for
+    REPLICA_STICKY_SECONDS before it was built: a lagging replica's response would
+    otherwise be served as a hit to clients that must read their own writes.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        cache = get_response_cache()
+        key = (request.endpoint, tuple(sorted(request.view_args.items())), tuple(sorted(request.args.items(multi=True))))
+        cached = cache.backend.get(key)
+        if cached is not None:
+            cache.count_hit()
+            body, status, headers = cached
+            response = current_app.response_class(body, status, headers)
+            response.headers['X-Cache'] = 'HIT'
+            return response.make_conditional(request)
+
+        cache.count_miss()
+        generation = cache.generation
+        caught_up = not g.get('read_replica') or \
+            time.monotonic() - cache.invalidated_at > current_app.config['REPLICA_STICKY_SECONDS']
+        g.cache_tags = set()
+        response = current_app.make_response(view(*args, **kwargs))
+        if response.status_code == 200 and not response.is_streamed and cache.generation == generation and caught_up:
+            cache.backend.set(key, (response.get_data(), response.status_code, list(response.headers)), frozenset(g.cache_tags))
+        response.headers['X-Cache'] = 'MISS'
+        return response
+    return wrapper
+
+
+def changed_tags(session):
+    """Cache tags touched by the objects being flushed."""
+    from app.models import Restaurant, Category, Reservation
+
+    tags = set()
+    for obj in session.new:
+        if isinstance(obj, Restaurant):
+            tags.update(('restaurants', 'category-membership'))
+            tags.update(f'category-members:{category.id}' for category in obj.categories)
+        elif isinstance(obj, Category):
+            tags.add('categories')
+        elif isinstance(obj, Reservation):
+            tags.add(f'reservations:{obj.restaurant_id}')
+
+    for obj in list(session.dirty) + list(session.deleted):
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        state = inspect(obj)
+        if isinstance(obj, Restaurant):
+            tags.add(f'restaurant:{obj.id}')
+            # Restaurants joining a category appear in that category's list
+            tags.update(f'category-members:{category.id}' for category in state.attrs.categories.history.added)
+            # Any membership change moves the category filters and facet counts of /api/restaurants
+            if obj in session.deleted or state.attrs.categories.history.has_changes():
+                tags.add('category-membership')
+            if obj in session.deleted:
+                tags.add('restaurants')
+        elif isinstance(obj, Category):
+            tags.update(('categories', f'category:{obj.id}', f'category-members:{obj.id}'))
+            if obj in session.deleted:
+                tags.add('category-membership')
+        elif isinstance(obj, Reservation):
+            tags.add(f'reservations:{obj.restaurant_id}')
+            tags.update(f'reservations:{restaurant_id}' for restaurant_id in state.attrs.restaurant_id.history.deleted)
+    return tags
+
+
+def invalidate_on_commit(session, tags):
+    """Evict tags once the current transaction commits, e.g. after Core writes that bypass the flush."""
+    session.info.setdefault('cache_tags', set()).update(tags)
+
+
+def _after_flush(session, flush_context):
+    invalidate_on_commit(session, changed_tags(session))
+
+
+def _after_commit(session):
+    tags = session.info.pop('cache_tags', None)
+    if tags and has_app_context() and 'response_cache' in current_app.extensions:
+        current_app.extensions['response_cache'].invalidate(tags)
+
+
+def _after_rollback(session):
+    session.info.pop('cache_tags', None)
+
+
+def init_app(app):
+    backend = app.config['RESPONSE_CACHE_BACKEND']
+    backend_class = CACHE_BACKENDS[backend] if backend in CACHE_BACKENDS else import_string(backend)
+    app.extensions['response_cache'] = ResponseCache(backend_class(app.config))
+
+    for name, listener in (('after_flush', _after_flush), ('after_commit', _after_commit),
+                           ('after_rollback', _after_rollback)):
+        if not event.contains(db.session, name, listener):
+            event.listen(db.session, name, listener)
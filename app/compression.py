@@ -0,0 +1,58 @@
+# app/compression.py
+
+import gzip
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip is offered
+    brotli = None
+
+
+def gzip_encode(data, config):
+    return gzip.compress(data, compresslevel=config['GZIP_LEVEL'], mtime=0)
+
+
+def brotli_encode(data, config):
+    return brotli.compress(data, quality=config['BROTLI_QUALITY'])
+
+
+ENCODERS = {'gzip': gzip_encode}
+if brotli is not None:
+    ENCODERS['br'] = brotli_encode
+
+
+def compress_response(response):
+    """
+    Compress the body with the best encoding the client accepts, in the order of
+    COMPRESSION_ALGORITHMS. Streamed, small and already encoded responses are
+    sent as they are.
+    """
+    config = current_app.config
+    if (response.status_code < 200 or response.status_code in (204, 206, 304) or response.is_streamed
+            or response.direct_passthrough or 'Content-Encoding' in response.headers
+            or response.mimetype not in config['COMPRESSION_MIMETYPES']):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < config['COMPRESSION_MIN_SIZE']:
+        return response
+    encoding = request.accept_encodings.best_match(
+        [algorithm for algorithm in config['COMPRESSION_ALGORITHMS'] if algorithm in ENCODERS]
+    )
+    if encoding is None:
+        return response
+
+    response.set_data(ENCODERS[encoding](data, config))
+    response.headers['Content-Encoding'] = encoding
+    # The encoded bytes differ from the identity ones. If-None-Match compares weakly,
+    # so a weak ETag still revalidates (304) while not claiming byte equality
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    app.after_request(compress_response)
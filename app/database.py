@@ -0,0 +1,31 @@
+# app/database.py
+
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+
+
+def upsert(connection, table):
+    """INSERT of the connection's dialect, with on_conflict_do_update() (SQLite >= 3.24 and PostgreSQL)."""
+    dialect = postgresql if connection.dialect.name == 'postgresql' else sqlite
+    return dialect.insert(table)
+
+
+def pragma_listener(pragmas):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+    return set_pragmas
+
+
+def init_app(app):
+    # Must run before the first connection is opened, so every pooled connection gets the PRAGMAs
+    pragmas = app.config['SQLITE_PRAGMAS']
+    if not pragmas:
+        return
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', pragma_listener(pragmas))
@@ -0,0 +1,118 @@
+# app/events.py
+
+import itertools
+import json
+import queue
+import threading
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from app import db
+
+
+class Subscription:
+    def __init__(self, restaurant_id, max_queued):
+        self.restaurant_id = restaurant_id
+        self.queue = queue.Queue(max_queued)
+        self.closed = False
+
+
+class EventBroker:
+    """
+    In-process pub/sub for reservation changes, one channel per restaurant.
+
+    Every subscriber has its own bounded queue, so an idle connection costs one
+    blocked thread (or greenlet under gevent) and a few objects. A subscriber that
+    falls max_queued events behind is dropped; its client reconnects and reloads.
+    """
+
+    def __init__(self, max_queued):
+        self.max_queued = max_queued
+        self.subscriptions = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def subscribe(self, restaurant_id):
+        subscription = Subscription(restaurant_id, self.max_queued)
+        with self.lock:
+            self.subscriptions.setdefault(restaurant_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.closed = True
+        with self.lock:
+            subscribers = self.subscriptions.get(subscription.restaurant_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscriptions[subscription.restaurant_id]
+
+    def publish(self, restaurant_id, name, data):
+        message = (next(self.ids), name, data)
+        with self.lock:
+            subscribers = list(self.subscriptions.get(restaurant_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(message)
+            except queue.Full:
+                self.unsubscribe(subscription)
+
+    def stream(self, subscription, heartbeat):
+        """Server-sent events for a subscription; a comment line every heartbeat seconds keeps proxies from closing it."""
+        try:
+            yield 'retry: 3000\n\n'
+            while not subscription.closed:
+                try:
+                    event_id, name, data = subscription.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield f'id: {event_id}\nevent: {name}\ndata: {json.dumps(data)}\n\n'
+        finally:
+            self.unsubscribe(subscription)
+
+
+def get_event_broker():
+    return current_app.extensions['event_broker']
+
+
+def reservation_events(session):
+    """(restaurant_id, event name, payload) for reservations created or changing status in this flush."""
+    from app.models import Reservation
+
+    events = []
+    for obj in session.new:
+        if isinstance(obj, Reservation):
+            events.append((obj.restaurant_id, 'reservation.created', obj))
+    for obj in session.dirty:
+        if isinstance(obj, Reservation) and inspect(obj).attrs.status.history.has_changes():
+            events.append((obj.restaurant_id, 'reservation.updated', obj))
+    # Serialize now: after commit the objects are expired and the session cannot load them
+    return [
+        (restaurant_id, name, dict(obj.to_dict(), timestamp=obj.timestamp.isoformat()))
+        for restaurant_id, name, obj in events
+    ]
+
+
+def _after_flush(session, flush_context):
+    session.info.setdefault('reservation_events', []).extend(reservation_events(session))
+
+
+def _after_commit(session):
+    events = session.info.pop('reservation_events', None)
+    if events and has_app_context() and 'event_broker' in current_app.extensions:
+        broker = current_app.extensions['event_broker']
+        for restaurant_id, name, data in events:
+            broker.publish(restaurant_id, name, data)
+
+
+def _after_rollback(session):
+    session.info.pop('reservation_events', None)
+
+
+def init_app(app):
+    app.extensions['event_broker'] = EventBroker(app.config['EVENT_STREAM_MAX_QUEUED'])
+
+    for name, listener in (('after_flush', _after_flush), ('after_commit', _after_commit),
+                           ('after_rollback', _after_rollback)):
+        if not event.contains(db.session, name, listener):
+            event.listen(db.session, name, listener)
@@ -0,0 +1,159 @@
+# app/facets.py
+
+import threading
+import time
+from flask import current_app
+from flask_sqlalchemy.track_modifications import models_committed
+from sqlalchemy import inspect, select
+from app import db
+from app.replicas import PRIMARY
+
+
+class CategoryBitmaps:
+    """
+    Restaurant ids per category as Python int bitsets: bit n of a category's
+    bitmap is set when restaurant n belongs to it. ANY/ALL filters are ORs/ANDs of
+    bitmaps and a facet count is the popcount of an AND, so neither touches the
+    database however many restaurants match.
+    """
+
+    def __init__(self):
+        self.bitmaps = {}
+        self.restaurants = 0  # Every restaurant, with or without categories
+        self.built_at = None
+
+    def build(self, restaurant_ids, links):
+        # Bits are set in bytearrays and converted once: OR-ing into a growing int copies it every time
+        size = max(restaurant_ids, default=0) // 8 + 1
+        restaurants, bitmaps = bytearray(size), {}
+        for restaurant_id in restaurant_ids:
+            restaurants[restaurant_id >> 3] |= 1 << (restaurant_id & 7)
+        for restaurant_id, category_id in links:
+            if restaurant_id >> 3 < size:
+                bitmap = bitmaps.get(category_id) or bitmaps.setdefault(category_id, bytearray(size))
+                bitmap[restaurant_id >> 3] |= 1 << (restaurant_id & 7)
+        self.bitmaps = {category_id: int.from_bytes(bitmap, 'little') for category_id, bitmap in bitmaps.items()}
+        self.restaurants = int.from_bytes(restaurants, 'little')
+        self.built_at = time.monotonic()
+
+    def remove(self, restaurant_id):
+        bit = 1 << restaurant_id
+        self.restaurants &= ~bit
+        for category_id, bitmap in list(self.bitmaps.items()):
+            if bitmap & bit:
+                self.bitmaps[category_id] = bitmap & ~bit
+
+    def set_categories(self, restaurant_id, category_ids):
+        self.remove(restaurant_id)
+        bit = 1 << restaurant_id
+        self.restaurants |= bit
+        for category_id in category_ids:
+            self.bitmaps[category_id] = self.bitmaps.get(category_id, 0) | bit
+
+    def matching(self, category_ids, match_all=False):
+        """Bitmap of restaurants in all (or any) of category_ids; every restaurant when none are given."""
+        if not category_ids:
+            return self.restaurants
+        bitmaps = [self.bitmaps.get(category_id, 0) for category_id in category_ids]
+        result = bitmaps[0]
+        for bitmap in bitmaps[1:]:
+            result = result & bitmap if match_all else result | bitmap
+        return result
+
+    def counts(self, bitmap):
+        """Restaurants of bitmap in each category, leaving out categories with none."""
+        counts = {}
+        for category_id, category_bitmap in self.bitmaps.items():
+            count = (bitmap & category_bitmap).bit_count()
+            if count:
+                counts[category_id] = count
+        return counts
+
+
+def bitmap_ids(bitmap, after=0, limit=None):
+    """Ascending restaurant ids set in bitmap that are greater than after, at most limit of them."""
+    bitmap >>= after + 1
+    restaurant_id, ids = after, []
+    while bitmap and (limit is None or len(ids) < limit):
+        skip = (bitmap & -bitmap).bit_length()  # Distance to the lowest set bit, plus one
+        restaurant_id += skip
+        bitmap >>= skip
+        ids.append(restaurant_id)
+    return ids
+
+
+class CategoryIndex:
+    """
+    Keeps CategoryBitmaps in sync with restaurant_categories, like NearbyRestaurants
+    does for coordinates: committed restaurant writes mark ids as stale and are
+    re-read in one query on the next lookup. Deleting a category, and age beyond
+    FACET_INDEX_MAX_AGE seconds (writes made by other processes), rebuild it.
+    It reads the primary, never a replica.
+    """
+
+    def __init__(self, max_age):
+        self.bitmaps = CategoryBitmaps()
+        self.max_age = max_age
+        self.stale_ids = set()
+        self.rebuild = False
+        self.lock = threading.Lock()
+
+    def mark_stale(self, restaurant_ids=(), rebuild=False):
+        with self.lock:
+            self.stale_ids.update(restaurant_ids)
+            self.rebuild = self.rebuild or rebuild
+
+    def refresh(self):
+        from app.models import Restaurant, restaurant_categories
+        links = select(restaurant_categories.c.restaurant_id, restaurant_categories.c.category_id)
+
+        built_at = self.bitmaps.built_at
+        with self.lock:
+            rebuild, self.rebuild = self.rebuild, False
+        if rebuild or built_at is None or time.monotonic() - built_at > self.max_age:
+            with self.lock:
+                self.stale_ids.clear()
+            # Plain Core rows: loading them through the ORM result machinery costs more than the build itself
+            connection = db.session.connection(bind_arguments=PRIMARY)
+            self.bitmaps.build(connection.scalars(select(Restaurant.id)).all(), connection.execute(links).all())
+            return
+
+        with self.lock:
+            stale_ids, self.stale_ids = self.stale_ids, set()
+        if stale_ids:
+            existing = set(db.session.scalars(select(Restaurant.id).where(Restaurant.id.in_(stale_ids)), bind_arguments=PRIMARY))
+            categories = {restaurant_id: [] for restaurant_id in existing}
+            for restaurant_id, category_id in db.session.execute(
+                links.where(restaurant_categories.c.restaurant_id.in_(existing)), bind_arguments=PRIMARY
+            ):
+                categories[restaurant_id].append(category_id)
+            for restaurant_id in stale_ids:
+                if restaurant_id in existing:
+                    self.bitmaps.set_categories(restaurant_id, categories[restaurant_id])
+                else:
+                    self.bitmaps.remove(restaurant_id)
+
+    def filter(self, category_ids, match_all=False):
+        self.refresh()
+        return self.bitmaps.matching(category_ids, match_all)
+
+    def facets(self, bitmap):
+        return self.bitmaps.counts(bitmap)
+
+
+def get_category_index():
+    return current_app.extensions['category_index']
+
+
+def _on_models_committed(app, changes):
+    from app.models import Restaurant, Category
+    restaurant_ids = [inspect(obj).identity[0] for obj, operation in changes
+                      if isinstance(obj, Restaurant) and inspect(obj).identity]
+    rebuild = any(isinstance(obj, Category) and operation == 'delete' for obj, operation in changes)
+    if restaurant_ids or rebuild:
+        app.extensions['category_index'].mark_stale(restaurant_ids, rebuild)
+
+
+def init_app(app):
+    app.extensions['category_index'] = CategoryIndex(app.config['FACET_INDEX_MAX_AGE'])
+    models_committed.connect(_on_models_committed, app)
@@ -0,0 +1,181 @@
+# app/geo.py
+
+import heapq
+import math
+import threading
+import time
+from flask import current_app
+from flask_sqlalchemy.track_modifications import models_committed
+from sqlalchemy import inspect, select
+from app import db
+from app.replicas import PRIMARY
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.195
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class SpatialIndex:
+    """
+    In-process grid index over restaurant coordinates for k-nearest queries.
+
+    Points are bucketed into square cells of `cell_size` degrees. A query scans
+    rings of cells around the query point and stops as soon as no unscanned cell
+    can hold anything closer than the current k-th result, so only a handful of
+    buckets are visited. Longitudes do not wrap around the antimeridian.
+    """
+
+    def __init__(self, cell_size=0.01):
+        self.cell_size = cell_size
+        self.buckets = {}
+        self.cells = {}
+        self.built_at = None
+        self.lock = threading.Lock()
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_size), math.floor(lon / self.cell_size))
+
+    def __len__(self):
+        return len(self.cells)
+
+    def build(self, rows):
+        """Replace the index contents with (id, latitude, longitude) rows."""
+        buckets, cells = {}, {}
+        for restaurant_id, lat, lon in rows:
+            if lat is None or lon is None:
+                continue
+            cell = self._cell(lat, lon)
+            buckets.setdefault(cell, {})[restaurant_id] = (lat, lon)
+            cells[restaurant_id] = cell
+        with self.lock:
+            self.buckets, self.cells = buckets, cells
+            self.built_at = time.monotonic()
+
+    def remove(self, restaurant_id):
+        with self.lock:
+            cell = self.cells.pop(restaurant_id, None)
+            if cell is not None:
+                bucket = self.buckets[cell]
+                bucket.pop(restaurant_id, None)
+                if not bucket:
+                    del self.buckets[cell]
+
+    def upsert(self, restaurant_id, lat, lon):
+        self.remove(restaurant_id)
+        if lat is None or lon is None:
+            return
+        cell = self._cell(lat, lon)
+        with self.lock:
+            self.buckets.setdefault(cell, {})[restaurant_id] = (lat, lon)
+            self.cells[restaurant_id] = cell
+
+    def nearest(self, lat, lon, k, radius_km):
+        """Return up to k (distance_km, restaurant_id) pairs within radius_km, closest first."""
+        ci, cj = self._cell(lat, lon)
+        heap = []  # max-heap of the k best results, stored as (-distance, id)
+        ring = 0
+        with self.lock:
+            buckets = self.buckets
+            while True:
+                if ring == 0:
+                    ring_cells = [(ci, cj)]
+                else:
+                    ring_cells = [(ci + di, cj + dj)
+                                  for di in range(-ring, ring + 1)
+                                  for dj in (-ring, ring)]
+                    ring_cells += [(ci + di, cj + dj)
+                                   for di in (-ring, ring)
+                                   for dj in range(-ring + 1, ring)]
+                for cell in ring_cells:
+                    for restaurant_id, (plat, plon) in buckets.get(cell, {}).items():
+                        distance = haversine_km(lat, lon, plat, plon)
+                        if distance > radius_km:
+                            continue
+                        if len(heap) < k:
+                            heapq.heappush(heap, (-distance, restaurant_id))
+                        elif distance < -heap[0][0]:
+                            heapq.heapreplace(heap, (-distance, restaurant_id))
+
+                # Anything outside the scanned rings is at least this far away
+                edge_lat = min(abs(lat) + (ring + 1) * self.cell_size, 89.0)
+                bound_km = ring * self.cell_size * KM_PER_DEGREE * math.cos(math.radians(edge_lat))
+                if bound_km > radius_km or (len(heap) == k and bound_km >= -heap[0][0]):
+                    break
+                ring += 1
+        return sorted((-distance, restaurant_id) for distance, restaurant_id in heap)
+
+
+class NearbyRestaurants:
+    """
+    Keeps a SpatialIndex in sync with the restaurants table.
+
+    Committed writes only mark restaurant ids as stale; they are re-read in one
+    query on the next lookup. The whole index is rebuilt once it is older than
+    NEARBY_INDEX_MAX_AGE seconds, which picks up writes made by other processes.
+    Both read the primary: a lagging replica would put the old rows back for good.
+    """
+
+    def __init__(self, cell_size, max_age):
+        self.index = SpatialIndex(cell_size)
+        self.max_age = max_age
+        self.stale_ids = set()
+        self.lock = threading.Lock()
+
+    def mark_stale(self, restaurant_ids):
+        with self.lock:
+            self.stale_ids.update(restaurant_ids)
+
+    def refresh(self):
+        from app.models import Restaurant
+        columns = (Restaurant.id, Restaurant.latitude, Restaurant.longitude)
+
+        built_at = self.index.built_at
+        if built_at is None or time.monotonic() - built_at > self.max_age:
+            with self.lock:
+                self.stale_ids.clear()
+            self.index.build(db.session.execute(
+                select(*columns).execution_options(yield_per=5000), bind_arguments=PRIMARY
+            ))
+            return
+
+        with self.lock:
+            stale_ids, self.stale_ids = self.stale_ids, set()
+        if stale_ids:
+            rows = {row.id: row for row in db.session.execute(
+                select(*columns).where(Restaurant.id.in_(stale_ids)), bind_arguments=PRIMARY
+            )}
+            for restaurant_id in stale_ids:
+                row = rows.get(restaurant_id)
+                if row is None:
+                    self.index.remove(restaurant_id)
+                else:
+                    self.index.upsert(restaurant_id, row.latitude, row.longitude)
+
+    def nearest(self, lat, lon, k, radius_km):
+        self.refresh()
+        return self.index.nearest(lat, lon, k, radius_km)
+
+
+def get_nearby_index():
+    return current_app.extensions['nearby_restaurants']
+
+
+def _on_models_committed(app, changes):
+    from app.models import Restaurant
+    restaurant_ids = [inspect(obj).identity[0] for obj, operation in changes
+                      if isinstance(obj, Restaurant) and inspect(obj).identity]
+    if restaurant_ids:
+        app.extensions['nearby_restaurants'].mark_stale(restaurant_ids)
+
+
+def init_app(app):
+    app.extensions['nearby_restaurants'] = NearbyRestaurants(
+        app.config['NEARBY_INDEX_CELL_SIZE'], app.config['NEARBY_INDEX_MAX_AGE']
+    )
+    models_committed.connect(_on_models_committed, app)
@@ -0,0 +1,271 @@
+# app/geocoding.py
+
+import hashlib
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, update, insert
+from sqlalchemy.exc import IntegrityError
+from werkzeug.utils import import_string
+from app import db
+from app.metrics import get_metrics
+
+
+class GeocoderError(Exception):
+    """Raised by a geocoder backend on a transient failure. Failures are never cached."""
+
+
+class NominatimGeocoder:
+    """Geocodes through the public Nominatim service (network)."""
+
+    def __init__(self, config):
+        from geopy.geocoders import Nominatim
+        self.geolocator = Nominatim(user_agent=config['GEOCODER_USER_AGENT'], timeout=config['GEOCODER_TIMEOUT'])
+        self.max_retries = config['GEOCODER_MAX_RETRIES']
+        self.retry_delay = config['GEOCODER_RETRY_DELAY']
+
+    def geocode(self, address):
+        from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+        for attempt in range(self.max_retries):
+            try:
+                location = self.geolocator.geocode(address)
+                return (location.latitude, location.longitude) if location else None
+            except (GeocoderTimedOut, GeocoderServiceError) as e:
+                current_app.logger.error(f"Geocoding error for address '{address}': {e}")
+                if attempt + 1 < self.max_retries:
+                    time.sleep(self.retry_delay)  # Wait before retrying
+        raise GeocoderError(f"Geocoding failed for address '{address}'")
+
+
+class OfflineGeocoder:
+    """
+    Local stand-in for tests and bulk seeding. Never touches the network:
+    every address maps to a stable point inside OFFLINE_GEOCODER_BBOX.
+    """
+
+    def __init__(self, config):
+        self.south, self.west, self.north, self.east = config['OFFLINE_GEOCODER_BBOX']
+
+    def geocode(self, address):
+        digest = hashlib.sha1(address.encode('utf-8')).digest()
+        x = int.from_bytes(digest[:8], 'big') / 2 ** 64
+        y = int.from_bytes(digest[8:16], 'big') / 2 ** 64
+        return (self.south + x * (self.north - self.south), self.west + y * (self.east - self.west))
+
+
+GEOCODER_BACKENDS = {
+    'nominatim': NominatimGeocoder,
+    'offline': OfflineGeocoder,
+}
+
+
+def normalize_address(address):
+    """Cache key for an address: lowercase, single spaces, no spacing around commas."""
+    address = re.sub(r'\s+', ' ', address.strip().lower())
+    return re.sub(r'\s*,\s*', ', ', address)[:255]
+
+
+def get_geocoder():
+    return current_app.extensions['geocoder']
+
+
+def _cached(key):
+    from app.models import GeocodeCache
+    with db.engine.connect() as conn:
+        row = conn.execute(
+            select(GeocodeCache.latitude, GeocodeCache.longitude, GeocodeCache.updated_at)
+            .where(GeocodeCache.address_key == key)
+        ).first()
+    if row is None:
+        return None
+    found = row.latitude is not None
+    ttl = current_app.config['GEOCODE_CACHE_TTL' if found else 'GEOCODE_NEGATIVE_TTL']
+    if datetime.utcnow() - row.updated_at > timedelta(seconds=ttl):
+        return None
+    return (row.latitude, row.longitude)
+
+
+def _store(key, lat, lon):
+    from app.models import GeocodeCache
+    values = {'latitude': lat, 'longitude': lon, 'updated_at': datetime.utcnow()}
+    try:
+        # Own connection, so the entry survives a rollback of the caller's session
+        with db.engine.begin() as conn:
+            result = conn.execute(update(GeocodeCache).where(GeocodeCache.address_key == key).values(**values))
+            if result.rowcount == 0:
+                conn.execute(insert(GeocodeCache).values(address_key=key, **values))
+    except IntegrityError:
+        pass  # Another worker cached the same address concurrently
+
+
+def _record_lookup(result, started):
+    metrics = get_metrics()
+    metrics.inc('geocode_lookups_total', (result,))
+    metrics.observe('geocoder_request_duration_seconds', (result,), time.perf_counter() - started)
+
+
+def geocode_address(address, raise_errors=False):
+    """
+    Return (latitude, longitude) for an address, or (None, None) if it cannot be found.
+    Results, including "not found", are cached in the geocode_cache table, so a repeat
+    address never reaches the geocoder backend while its entry is fresh.
+
+    Transient backend failures also return (None, None) unless raise_errors is set,
+    in which case GeocoderError propagates so the caller can retry later.
+    """
+    key = normalize_address(address)
+    cached = _cached(key)
+    if cached is not None:
+        get_metrics().inc('geocode_lookups_total', ('cached',))
+        return cached
+
+    started = time.perf_counter()
+    try:
+        location = get_geocoder().geocode(address)
+    except GeocoderError:
+        _record_lookup('error', started)
+        if raise_errors:
+            raise
+        return (None, None)
+
+    _record_lookup('found' if location else 'not_found', started)
+    lat, lon = location if location else (None, None)
+    _store(key, lat, lon)
+    return (lat, lon)
+
+
+class GeocodeQueue:
+    """
+    Background geocoding for restaurants.
+
+    The restaurants table is the queue: rows with geocode_status 'pending' and a due
+    geocode_next_attempt_at are claimed with a conditional UPDATE, so several worker
+    processes never geocode the same row twice. Claimed rows are geocoded in a thread
+    pool; transient failures are retried with exponential backoff. A sweeper thread
+    picks up due rows, including those left over from before a restart.
+
+    The pool and the sweeper start lazily in each process, on its first request or
+    enqueue: threads do not survive a fork (gunicorn --preload), and CLI commands
+    never start them.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.workers = app.config['GEOCODE_WORKERS']
+        self.executor = None
+        self.sweeper = None
+        self.pid = None  # Process the threads were started in
+        self.lock = threading.Lock()
+
+    def start(self):
+        if not self.workers or self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid != os.getpid():
+                self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix='geocode')
+                self.sweeper = threading.Thread(target=self._sweep_forever, name='geocode-sweeper', daemon=True)
+                self.sweeper.start()
+                self.pid = os.getpid()
+
+    def enqueue(self, restaurant_id):
+        """Geocode a committed pending restaurant in the background (inline when GEOCODE_WORKERS is 0)."""
+        if not self.workers:
+            self.run(restaurant_id)
+            return
+        self.start()
+        self.executor.submit(self.run, restaurant_id)
+
+    def _sweep_forever(self):
+        while True:
+            time.sleep(self.app.config['GEOCODE_SWEEP_INTERVAL'])
+            try:
+                with self.app.app_context():
+                    due_ids = self.due_ids()
+                for restaurant_id in due_ids:
+                    self.executor.submit(self.run, restaurant_id)
+            except Exception:
+                self.app.logger.exception('Geocode sweep failed')
+
+    def due_ids(self, limit=100):
+        from app.models import Restaurant
+        return db.session.scalars(
+            select(Restaurant.id).where(
+                Restaurant.geocode_status == 'pending',
+                Restaurant.geocode_next_attempt_at <= datetime.utcnow()
+            ).limit(limit)
+        ).all()
+
+    def _claim(self, restaurant_id, now):
+        # Push the next attempt out by a lease, so no other worker picks the row meanwhile
+        from app.models import Restaurant
+        lease = now + timedelta(seconds=self.app.config['GEOCODE_CLAIM_LEASE'])
+        result = db.session.execute(
+            update(Restaurant).where(
+                Restaurant.id == restaurant_id,
+                Restaurant.geocode_status == 'pending',
+                Restaurant.geocode_next_attempt_at <= now
+            ).values(geocode_next_attempt_at=lease)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def run(self, restaurant_id):
+        from app.models import Restaurant
+        with self.app.app_context():
+            now = datetime.utcnow()
+            if not self._claim(restaurant_id, now):
+                return
+            restaurant = db.session.get(Restaurant, restaurant_id)
+            if restaurant is None:
+                return  # Deleted since it was queued
+            address = restaurant.address
+            db.session.commit()  # Nothing is held open during the network call
+
+            try:
+                lat, lon = geocode_address(address, raise_errors=True)
+            except GeocoderError:
+                restaurant = db.session.get(Restaurant, restaurant_id)
+                if restaurant is None or restaurant.address != address:
+                    return  # Deleted, or address edited meanwhile: the failure is not the new address's
+                restaurant.geocode_attempts += 1
+                if restaurant.geocode_attempts >= self.app.config['GEOCODE_MAX_ATTEMPTS']:
+                    restaurant.geocode_status = 'failed'
+                else:
+                    backoff = self.app.config['GEOCODE_RETRY_BACKOFF'] * 2 ** (restaurant.geocode_attempts - 1)
+                    restaurant.geocode_next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff)
+                db.session.commit()
+                return
+
+            restaurant = db.session.get(Restaurant, restaurant_id)
+            if restaurant is None or restaurant.address != address:
+                return  # Deleted, or address edited meanwhile (that edit queued a new job)
+            restaurant.latitude, restaurant.longitude = lat, lon
+            restaurant.geocode_status = 'done' if lat is not None else 'failed'
+            restaurant.geocode_attempts += 1
+            db.session.commit()
+
+
+def get_geocode_queue():
+    return current_app.extensions['geocode_queue']
+
+
+def init_app(app):
+    backend = app.config['GEOCODER_BACKEND']
+    geocoder_class = GEOCODER_BACKENDS[backend] if backend in GEOCODER_BACKENDS else import_string(backend)
+    app.extensions['geocoder'] = geocoder_class(app.config)
+    queue = app.extensions['geocode_queue'] = GeocodeQueue(app)
+    # The first request of each serving process starts the sweeper, so pending rows left
+    # over from a restart are picked up without waiting for a new restaurant to be enqueued
+    app.before_request(queue.start)
+
+    @app.cli.command('geocode-pending')
+    def geocode_pending():
+        """Geocode every restaurant whose coordinates are still pending."""
+        due_ids = queue.due_ids(limit=None)
+        for restaurant_id in due_ids:
+            queue.run(restaurant_id)
+        print(f'Processed {len(due_ids)} pending restaurants.')
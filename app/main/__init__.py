@@ -2,7 +2,7 @@
 from flask import Blueprint
 
 
-bp = Blueprint('main', __name__)
+bp = Blueprint('main', __name__, cli_group=None)  # CLI commands registered at top level
 
 from app.main import routes
 
@@ -1,35 +1,33 @@
 # app/main/routes.py
 
-from flask import render_template, redirect, url_for, request, flash, jsonify, abort, current_app
+from flask import render_template, redirect, url_for, request, flash, jsonify, abort, current_app, Response, stream_with_context
 from app.main import bp
-from app.models import Restaurant, Reservation, Category, FrontendUser, User
+from app.models import Restaurant, Reservation, Category, FrontendUser, User, IdempotencyKey
+from app.models import RESTAURANT_LIST_PROFILE, USER_RESERVATIONS_PROFILE
 from app import db
 from datetime import datetime, timedelta
 from werkzeug.exceptions import BadRequest
 from app.main.forms import RestaurantForm
-from sqlalchemy.exc import SQLAlchemyError
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+from app.geo import get_nearby_index
+from app.geocoding import get_geocode_queue
+from app.availability import available_slots, within_opening_hours, CapacityExceeded
+from app.bulk import parse_payload, import_reservations, export_rows
+from app.stats import reservation_chart, restaurant_stats, category_stats
+from app.cache import cached_response, add_cache_tags, restaurant_tags, get_response_cache
+from app.versioning import restaurant_with_validators, user_reservations_validators, not_modified, with_validators
+from app.events import get_event_broker
+from app.search import search_restaurant_ids
+from app.facets import get_category_index, bitmap_ids
+from app.metrics import get_metrics
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError, OperationalError
+from sqlalchemy.orm import selectinload
+import hashlib
+import hmac
+import json
+import random
 import time
 from flask_login import login_required, current_user 
 
-# Initialize the Geocoder
-geolocator = Nominatim(user_agent="restaurant_reservation_app")
-# Define Helper Function for Geocoding
-def geocode_address(address, max_retries=3):
-    for attempt in range(max_retries):
-        try:
-            location = geolocator.geocode(address)
-            if location:
-                return (location.latitude, location.longitude)
-            else:
-                return (None, None)
-        except (GeocoderTimedOut, GeocoderServiceError) as e:
-            current_app.logger.error(f"Geocoding error for address '{address}': {e}")
-            time.sleep(1)  # Wait before retrying
-    return (None, None)
-
-
 
 # HTML Routes
 
@@ -83,14 +81,7 @@ def create_restaurant():
         # Fetch selected categories
         selected_categories = Category.query.filter(Category.id.in_(category_ids)).all()
 
-        # Geocode the address
-        lat, lon = geocode_address(address)
-        if lat is None or lon is None:
-            flash('Unable to geocode the address. Please ensure it is correct.', 'danger')
-            db.session.rollback()
-            return render_template('create_restaurant.html', form=form)
-        
-        # Create Restaurant and associate with User
+        # Create Restaurant and associate with User; coordinates are filled in by the geocode queue
         restaurant = Restaurant(
             name=name,
             address=address,
@@ -98,14 +89,14 @@ def create_restaurant():
             description=description,
             manager=user,  # Associate with User
             categories=selected_categories,
-            latitude=lat,
-            longitude=lon
+            geocode_status='pending'
         )
 
         db.session.add(restaurant)
         db.session.commit()
+        get_geocode_queue().enqueue(restaurant.id)
 
-        flash('Restaurant and user account created successfully!', 'success')
+        flash('Restaurant and user account created successfully! The map location appears once the address is geocoded.', 'success')
         return redirect(url_for('main.list_restaurants'))
     
     else:
@@ -124,7 +115,13 @@ def edit_restaurant(restaurant_id):
     if form.validate_on_submit():
         # Update restaurant attributes from form data
         restaurant.name = form.name.data
+        address_changed = restaurant.address != form.address.data
         restaurant.address = form.address.data
+        if address_changed:
+            # Re-geocode in the background
+            restaurant.geocode_status = 'pending'
+            restaurant.geocode_attempts = 0
+            restaurant.geocode_next_attempt_at = datetime.utcnow()
         restaurant.phone_number = form.phone_number.data
         restaurant.description = form.description.data
         
@@ -133,6 +130,8 @@ def edit_restaurant(restaurant_id):
         restaurant.categories = selected_categories
         
         db.session.commit()
+        if address_changed:
+            get_geocode_queue().enqueue(restaurant.id)
         flash('Restaurant updated successfully!', 'success')
         return redirect(url_for('main.get_restaurant_detail', restaurant_id=restaurant.id))
     else:
@@ -184,7 +183,7 @@ def update_reservation_status(reservation_id):
         if not new_status:
             return jsonify({'error': 'Missing required fields.'}), 400
 
-    if new_status not in ['accepted', 'declined']:
+    if new_status not in ['accepted', 'declined', 'no_show']:
         return jsonify({'error': 'Invalid status value.'}), 400
 
     try:
@@ -196,6 +195,9 @@ def update_reservation_status(reservation_id):
         db.session.commit()
         return jsonify({'message': f'Reservation {new_status} successfully.'}), 200
 
+    except CapacityExceeded:
+        db.session.rollback()
+        return jsonify({'error': 'No seats available for the selected time.'}), 409
     except SQLAlchemyError as e:
         db.session.rollback()
         current_app.logger.error(f"Database error: {str(e)}")
@@ -204,74 +206,301 @@ def update_reservation_status(reservation_id):
 
 # API ENDPOINTS
 
+# Helpers for keyset pagination on Restaurant.id
+def parse_page_args():
+    """Read ?limit= and ?cursor= from the query string. Raises BadRequest on invalid values."""
+    try:
+        limit = int(request.args.get('limit', current_app.config['API_PAGE_SIZE']))
+        cursor = int(request.args.get('cursor', 0))
+    except ValueError:
+        raise BadRequest('limit and cursor must be integers.')
+    if limit < 1 or cursor < 0:
+        raise BadRequest('limit must be positive and cursor must not be negative.')
+    return min(limit, current_app.config['API_MAX_PAGE_SIZE']), cursor
+
+def iter_keyset(query, column, batch_size, cursor=0):
+    """Yield rows of query ordered by column, fetching batch_size rows per round trip.
+
+    Each batch is expunged from the session once consumed, so memory stays flat
+    no matter how many rows the table holds.
+    """
+    while True:
+        batch = query.filter(column > cursor).order_by(column.asc()).limit(batch_size).all()
+        if not batch:
+            return
+        for row in batch:
+            yield row
+        cursor = getattr(batch[-1], column.key)
+        db.session.expunge_all()
+        if len(batch) < batch_size:
+            return
+
+def stream_json_array(rows, serializer):
+    """Stream rows as a single JSON array without building it in memory."""
+    def generate():
+        yield '['
+        for index, row in enumerate(rows):
+            yield (',' if index else '') + current_app.json.dumps(serializer(row))
+        yield ']'
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
 @bp.route('/api/restaurants', methods=['GET'])
+@cached_response
 def get_restaurants():
-    restaurants = Restaurant.query.all()
+    # Full export: stream every restaurant as one JSON array, fetched in keyset batches
+    if request.args.get('stream', '').lower() in ('1', 'true'):
+        query = Restaurant.query.options(*RESTAURANT_LIST_PROFILE)
+        rows = iter_keyset(query, Restaurant.id, current_app.config['API_STREAM_BATCH_SIZE'])
+        return stream_json_array(rows, Restaurant.to_dict)
+
+    try:
+        limit, cursor = parse_page_args()
+        category_ids, match_all = parse_category_filter()
+    except BadRequest as e:
+        return jsonify({'error': e.description}), 400
+
+    if category_ids is not None or request.args.get('facets', '').lower() in ('1', 'true'):
+        return faceted_restaurants(category_ids, match_all, limit, cursor)
+
+    # Fetch one extra row to know whether another page exists
+    restaurants = Restaurant.query.options(*RESTAURANT_LIST_PROFILE).filter(Restaurant.id > cursor).order_by(
+        Restaurant.id.asc()
+    ).limit(limit + 1).all()
+    has_more = len(restaurants) > limit
+    restaurants = restaurants[:limit]
+    add_cache_tags('restaurants', *restaurant_tags(restaurants))
+
+    return jsonify({
+        'restaurants': [restaurant.to_dict() for restaurant in restaurants],
+        'next_cursor': restaurants[-1].id if has_more else None
+    })
+
+def parse_category_filter():
+    """?categories=1,4,7 as a list of ids (None without the parameter) and whether ?match=all."""
+    match = request.args.get('match', 'any')
+    if match not in ('any', 'all'):
+        raise BadRequest('match must be any or all.')
+    if 'categories' not in request.args:
+        return None, match == 'all'
+    try:
+        category_ids = [int(value) for value in request.args['categories'].split(',') if value.strip()]
+    except ValueError:
+        raise BadRequest('categories must be a comma-separated list of category ids.')
+    return category_ids, match == 'all'
+
+def faceted_restaurants(category_ids, match_all, limit, cursor):
+    # Filtering, paging and facet counts come from the in-memory category bitmaps;
+    # only the page itself is loaded from the database
+    index = get_category_index()
+    matching = index.filter(category_ids, match_all)
+    ids = bitmap_ids(matching, cursor, limit + 1)
+    has_more = len(ids) > limit
+    ids = ids[:limit]
+    restaurants = Restaurant.query.options(*RESTAURANT_LIST_PROFILE).filter(Restaurant.id.in_(ids)).order_by(
+        Restaurant.id.asc()
+    ).all() if ids else []
+    add_cache_tags('restaurants', 'category-membership', *restaurant_tags(restaurants))
+
+    facets = sorted(index.facets(matching).items(), key=lambda item: (-item[1], item[0]))
+    return jsonify({
+        'restaurants': [restaurant.to_dict() for restaurant in restaurants],
+        'next_cursor': ids[-1] if has_more else None,
+        'total': matching.bit_count(),
+        'facets': [{'categoryId': category_id, 'count': count} for category_id, count in facets]
+    })
+
+@bp.route('/api/restaurants/search', methods=['GET'])
+def search_restaurants():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'q is required.'}), 400
+    try:
+        limit, offset = parse_page_args()
+    except BadRequest as e:
+        return jsonify({'error': e.description}), 400
+
+    # Ranked results have no stable key to seek from: the cursor is the number of results already returned
+    ids = search_restaurant_ids(query, limit + 1, offset)
+    has_more = len(ids) > limit
+    ids = ids[:limit]
+    by_id = {restaurant.id: restaurant for restaurant in Restaurant.query.options(*RESTAURANT_LIST_PROFILE).filter(
+        Restaurant.id.in_(ids)
+    )} if ids else {}
+
+    return jsonify({
+        'restaurants': [by_id[restaurant_id].to_dict() for restaurant_id in ids if restaurant_id in by_id],
+        'next_cursor': offset + limit if has_more else None
+    })
+
+@bp.route('/api/restaurants/nearby', methods=['GET'])
+def get_nearby_restaurants():
+    config = current_app.config
+    try:
+        lat = float(request.args['lat'])
+        lon = float(request.args['lon'])
+        radius = float(request.args.get('radius', config['NEARBY_DEFAULT_RADIUS_KM']))
+        limit = int(request.args.get('limit', config['NEARBY_DEFAULT_LIMIT']))
+    except KeyError:
+        return jsonify({'error': 'lat and lon are required.'}), 400
+    except ValueError:
+        return jsonify({'error': 'lat, lon, radius and limit must be numbers.'}), 400
+
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({'error': 'lat or lon out of range.'}), 400
+    if not (0 < radius <= config['NEARBY_MAX_RADIUS_KM']) or not (1 <= limit <= config['API_MAX_PAGE_SIZE']):
+        return jsonify({'error': 'Invalid radius or limit.'}), 400
+
+    matches = get_nearby_index().nearest(lat, lon, limit, radius)
+    restaurants = Restaurant.query.options(*RESTAURANT_LIST_PROFILE).filter(
+        Restaurant.id.in_([restaurant_id for _, restaurant_id in matches])
+    ).all()
+    by_id = {restaurant.id: restaurant for restaurant in restaurants}
+
     data = []
-    for restaurant in restaurants:
-        data.append({
-            'id': restaurant.id,
-            'name': restaurant.name,
-            'address': restaurant.address,
-            'phoneNumber': restaurant.phone_number,  # Changed to camelCase
-            'description': restaurant.description,
-            'latitude': restaurant.latitude,        # Added latitude
-            'longitude': restaurant.longitude, 
-            'categories': [category.name for category in restaurant.categories]
-        })
-    return jsonify(data)
+    for distance, restaurant_id in matches:
+        if restaurant_id in by_id:
+            item = by_id[restaurant_id].to_dict()
+            item['distanceKm'] = round(distance, 3)
+            data.append(item)
+    return jsonify({'restaurants': data})
 
 @bp.route('/api/restaurants/<int:restaurant_id>', methods=['GET'], endpoint='api_get_restaurant')
+@cached_response
 def api_get_restaurant(restaurant_id):
-    restaurant = Restaurant.query.get_or_404(restaurant_id)
-    
-    data = {
-        'id': restaurant.id,
-        'name': restaurant.name,
-        'address': restaurant.address,
-        'phoneNumber': restaurant.phone_number,  # Changed to camelCase
-        'description': restaurant.description,
-        'latitude': restaurant.latitude,        # Added latitude
-        'longitude': restaurant.longitude,      # Added longitude
-        'categories': [category.name for category in restaurant.categories],
-        'reservations': [
-            {
-                'id': reservation.id,
-                'reservationDatetime': reservation.reservation_datetime.isoformat(),
-                'personCount': reservation.person_count,  # Corrected attribute
-                'status': reservation.status,
-                'name': reservation.name  # Replaced 'userId' with 'name'
-            }
-            for reservation in restaurant.reservations
-        ]
-    }
-    
-    return jsonify(data)
+    found = restaurant_with_validators(restaurant_id)
+    if found is None:
+        abort(404)
+    restaurant, etag, last_modified = found
+    # Unchanged since the client's copy: answer from the validators alone
+    response = not_modified(etag, last_modified)
+    if response is not None:
+        return response
+
+    # One restaurant, so its categories and reservations are two plain lazy loads
+    add_cache_tags(f'reservations:{restaurant.id}', *restaurant_tags([restaurant]))
+    return with_validators(jsonify(restaurant.to_dict(include_reservations=True)), etag, last_modified)
+
+
+@bp.route('/api/restaurants/<int:restaurant_id>/availability', methods=['GET'])
+def get_availability(restaurant_id):
+    restaurant = Restaurant.query.options(selectinload(Restaurant.opening_hours)).filter_by(id=restaurant_id).first_or_404()
+
+    try:
+        day = datetime.strptime(request.args['date'], '%Y-%m-%d').date()
+        party_size = int(request.args['party_size'])
+    except KeyError:
+        return jsonify({'error': 'date and party_size are required.'}), 400
+    except ValueError:
+        return jsonify({'error': 'Invalid date or party_size format.'}), 400
+    if not 1 <= party_size <= current_app.config['MAX_PARTY_SIZE']:
+        return jsonify({'error': 'Invalid party_size.'}), 400
+
+    return jsonify({
+        'restaurant_id': restaurant.id,
+        'date': day.isoformat(),
+        'party_size': party_size,
+        'slot_minutes': restaurant.slot_minutes,
+        'slots': available_slots(restaurant, day, party_size)
+    })
+
+
+@bp.route('/api/restaurants/<int:restaurant_id>/events', methods=['GET'])
+@login_required
+def stream_reservation_events(restaurant_id):
+    # Managers only see their own restaurant's reservations
+    if current_user.restaurant is None or current_user.restaurant.id != restaurant_id:
+        abort(403)
+
+    broker = get_event_broker()
+    subscription = broker.subscribe(restaurant_id)
+    # No stream_with_context: the stream holds no app context, session or connection while idle
+    response = Response(broker.stream(subscription, current_app.config['EVENT_STREAM_HEARTBEAT']),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def parse_stats_range():
+    """[start, end) datetimes from ?from=&to= dates (inclusive), defaulting to the last STATS_DEFAULT_DAYS days."""
+    today = datetime.now().date()
+    start_date = datetime.strptime(request.args['from'], '%Y-%m-%d').date() if 'from' in request.args \
+        else today - timedelta(days=current_app.config['STATS_DEFAULT_DAYS'] - 1)
+    end_date = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if 'to' in request.args else today
+    if end_date < start_date:
+        raise ValueError('to is before from')
+    return datetime.combine(start_date, datetime.min.time()), datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+
+
+def cacheable_json(payload):
+    """JSON response with an ETag over its body; answers 304 when If-None-Match matches."""
+    response = jsonify(payload)
+    response.add_etag()
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['STATS_CACHE_MAX_AGE']
+    return response.make_conditional(request)
+
+
+@bp.route('/api/restaurants/<int:restaurant_id>/stats', methods=['GET'])
+def get_restaurant_stats(restaurant_id):
+    if db.session.get(Restaurant, restaurant_id) is None:
+        abort(404)
+    try:
+        start, end = parse_stats_range()
+    except ValueError:
+        return jsonify({'error': 'Invalid from or to date.'}), 400
+
+    data = restaurant_stats(restaurant_id, start, end)
+    data.update({'restaurant_id': restaurant_id, 'from': start.date().isoformat(),
+                 'to': (end - timedelta(days=1)).date().isoformat()})
+    return cacheable_json(data)
+
+
+@bp.route('/api/stats/categories', methods=['GET'])
+def get_category_stats():
+    try:
+        start, end = parse_stats_range()
+    except ValueError:
+        return jsonify({'error': 'Invalid from or to date.'}), 400
 
+    return cacheable_json({
+        'from': start.date().isoformat(),
+        'to': (end - timedelta(days=1)).date().isoformat(),
+        'categories': category_stats(start, end)
+    })
 
 
 @bp.route('/api/categories', methods=['GET'])
+@cached_response
 def get_categories():
     categories = Category.query.all()
+    add_cache_tags('categories')
     data = [{'id': category.id, 'name': category.name} for category in categories]
     return jsonify(data)
 
 @bp.route('/api/categories/<int:category_id>/restaurants', methods=['GET'])
+@cached_response
 def get_restaurants_by_category(category_id):
-    category = Category.query.get_or_404(category_id)
-    restaurants = category.restaurants
-    data = []
-    for restaurant in restaurants:
-        data.append({
-            'id': restaurant.id,
-            'name': restaurant.name,
-            'address': restaurant.address,
-            'phoneNumber': restaurant.phone_number,  # Changed to camelCase
-            'description': restaurant.description,
-            'categories': [cat.name for cat in restaurant.categories]
-            # Optionally, include reservations if needed
-        })
-    return jsonify(data)
+    Category.query.get_or_404(category_id)
+    restaurants = Restaurant.query.options(*RESTAURANT_LIST_PROFILE).join(Restaurant.categories).filter(
+        Category.id == category_id
+    ).order_by(Restaurant.id.asc()).all()
+    add_cache_tags(f'category-members:{category_id}', *restaurant_tags(restaurants))
+    return jsonify([restaurant.to_dict() for restaurant in restaurants])
+
+@bp.route('/api/cache/stats', methods=['GET'])
+@login_required
+def get_cache_stats():
+    return jsonify(get_response_cache().stats())
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    token = current_app.config['METRICS_TOKEN']
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({'error': 'Invalid metrics token.'}), 401
+    return Response(get_metrics().render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 
 @bp.route('/api/reservations', methods=['POST'])
 def create_reservation():
@@ -297,11 +526,20 @@ def create_reservation():
     if not restaurant:
         return jsonify({'error': 'Restaurant not found.'}), 404
 
+    try:
+        number_of_people = int(number_of_people)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid number of people.'}), 400
+    if not 1 <= number_of_people <= restaurant.seat_capacity:
+        return jsonify({'error': 'Invalid number of people.'}), 400
+
     try:
         # Combine date and time into a single datetime object
         reservation_datetime = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
     except ValueError:
         return jsonify({'error': 'Invalid date or time format.'}), 400
+    if not within_opening_hours(restaurant, reservation_datetime):
+        return jsonify({'error': 'The restaurant is closed at the selected time.'}), 400
 
     try:
         # Parse timestamp
@@ -309,6 +547,46 @@ def create_reservation():
     except ValueError:
         return jsonify({'error': 'Invalid timestamp format.'}), 400
 
+    # Retries of the same request (same Idempotency-Key header, or else the same
+    # user_id + client timestamp) return the original reservation without writing again
+    idempotency_key = hash_idempotency_key(
+        request.headers.get('Idempotency-Key') or f"{user_id}|{timestamp_str}"
+    )
+
+    # Book atomically: the slot counters are claimed with conditional updates during the
+    # flush (see app/availability.py). Lost races on a new FrontendUser, an empty slot
+    # row or the idempotency key, and lock timeouts, are retried with a fresh transaction.
+    max_retries = current_app.config['BOOKING_MAX_RETRIES']
+    for attempt in range(max_retries):
+        try:
+            replayed = db.session.get(IdempotencyKey, idempotency_key)
+            if replayed and replayed.expires_at > datetime.utcnow():
+                response = jsonify({'message': 'Reservation created successfully.', 'reservation_id': replayed.reservation_id})
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response, 201
+
+            new_reservation = book_reservation(
+                user_id, restaurant_id, name, reservation_datetime, number_of_people, timestamp,
+                idempotency_key, expired_key=replayed
+            )
+            break
+        except CapacityExceeded:
+            db.session.rollback()
+            return jsonify({'error': 'No seats available for the selected time.'}), 409
+        except (IntegrityError, OperationalError) as e:
+            db.session.rollback()
+            current_app.logger.warning(f"Booking attempt {attempt + 1} failed, retrying: {e.orig}")
+            time.sleep(current_app.config['BOOKING_RETRY_BACKOFF'] * (2 ** attempt) * random.random())
+    else:
+        return jsonify({'error': 'The reservation could not be saved, please try again.'}), 503
+
+    return jsonify({'message': 'Reservation created successfully.', 'reservation_id': new_reservation.id}), 201
+
+def hash_idempotency_key(value):
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+def book_reservation(user_id, restaurant_id, name, reservation_datetime, number_of_people, timestamp,
+                     idempotency_key, expired_key=None):
     # Handle FrontendUser
     frontend_user = FrontendUser.query.filter_by(user_id=user_id).first()
     if not frontend_user:
@@ -329,9 +607,18 @@ def create_reservation():
     )
 
     db.session.add(new_reservation)
-    db.session.commit()
 
-    return jsonify({'message': 'Reservation created successfully.', 'reservation_id': new_reservation.id}), 201
+    # Remember the request in the same transaction as the booking
+    if expired_key is not None:
+        db.session.delete(expired_key)
+        db.session.flush()
+    db.session.add(IdempotencyKey(
+        key=idempotency_key,
+        reservation=new_reservation,
+        expires_at=datetime.utcnow() + timedelta(seconds=current_app.config['IDEMPOTENCY_KEY_TTL'])
+    ))
+    db.session.commit()
+    return new_reservation
 
 
 # Endpoint to update reservation status (accept or decline)
@@ -343,7 +630,7 @@ def update_reservation(reservation_id):
 
     status = data.get('status')  # Assuming 'status' remains unchanged
 
-    if status not in ['accepted', 'declined']:
+    if status not in ['accepted', 'declined', 'no_show']:
         return jsonify({'error': 'Invalid status value.'}), 400
 
     reservation = Reservation.query.get(reservation_id)
@@ -351,31 +638,79 @@ def update_reservation(reservation_id):
         return jsonify({'error': 'Reservation not found.'}), 404
 
     reservation.status = status
-    db.session.commit()
+    try:
+        db.session.commit()
+    except CapacityExceeded:
+        db.session.rollback()
+        return jsonify({'error': 'No seats available for the selected time.'}), 409
 
     return jsonify({'message': f'Reservation {status} successfully.'}), 200
 
+@bp.route('/api/reservations/bulk', methods=['POST'])
+def bulk_create_reservations():
+    try:
+        rows = parse_payload(request.get_data(), request.content_type or '')
+    except ValueError:
+        return jsonify({'error': 'Invalid JSON or JSON Lines data.'}), 400
+    if not rows:
+        return jsonify({'error': 'No reservations given.'}), 400
+    if len(rows) > current_app.config['BULK_MAX_ROWS']:
+        return jsonify({'error': f"At most {current_app.config['BULK_MAX_ROWS']} reservations per request."}), 413
+
+    # Whole batch in one transaction; retried if a concurrent writer raced it
+    max_retries = current_app.config['BOOKING_MAX_RETRIES']
+    for attempt in range(max_retries):
+        try:
+            results = import_reservations(rows)
+            break
+        except (CapacityExceeded, IntegrityError, OperationalError) as e:
+            db.session.rollback()
+            current_app.logger.warning(f"Bulk import attempt {attempt + 1} failed, retrying: {e}")
+            time.sleep(current_app.config['BOOKING_RETRY_BACKOFF'] * (2 ** attempt) * random.random())
+    else:
+        return jsonify({'error': 'The reservations could not be saved, please try again.'}), 503
+
+    created = sum(1 for result in results if result['status'] == 'created')
+    return jsonify({'created': created, 'failed': len(results) - created, 'results': results}), 200
+
+@bp.route('/api/reservations/export', methods=['GET'])
+def export_reservations():
+    restaurant_id = request.args.get('restaurant_id', type=int)
+    status = request.args.get('status')
+    since = request.args.get('since')
+    try:
+        since = datetime.fromisoformat(since.replace('Z', '+00:00')) if since else None
+    except ValueError:
+        return jsonify({'error': 'Invalid since timestamp.'}), 400
+
+    rows = export_rows(restaurant_id, status, since, current_app.config['API_STREAM_BATCH_SIZE'])
+    lines = (current_app.json.dumps(row) + '\n' for row in rows)
+    return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+
+@bp.cli.command('purge-idempotency-keys')
+def purge_idempotency_keys():
+    """Delete expired idempotency keys."""
+    deleted = IdempotencyKey.query.filter(IdempotencyKey.expires_at <= datetime.utcnow()).delete()
+    db.session.commit()
+    print(f'Deleted {deleted} expired idempotency keys.')
+
 # retrieve all reservations for a specific user_id (frontend)
 @bp.route('/api/users/<string:user_id>/reservations', methods=['GET'])
 def get_user_reservations(user_id):
-    frontend_user = FrontendUser.query.filter_by(user_id=user_id).first()
-    if not frontend_user:
+    found = user_reservations_validators(user_id)
+    if found is None:
         return jsonify({'error': 'User not found.'}), 404
+    frontend_user_id, etag, last_modified = found
+    response = not_modified(etag, last_modified)
+    if response is not None:
+        return response
 
-    reservations = frontend_user.reservations
-    reservations_data = []
-    for reservation in reservations:
-        reservations_data.append({
-            'reservation_id': reservation.id,
-            'restaurant_id': reservation.restaurant_id,
-            'restaurant_name': reservation.restaurant.name,
-            'reservation_datetime': reservation.reservation_datetime.isoformat(),
-            'person_count': reservation.person_count,
-            'status': reservation.status,
-            'name': reservation.name
-        })
+    reservations = Reservation.query.options(*USER_RESERVATIONS_PROFILE).filter_by(
+        frontend_user_id=frontend_user_id
+    ).order_by(Reservation.reservation_datetime.asc()).all()
+    reservations_data = [reservation.to_user_dict() for reservation in reservations]
 
-    return jsonify({'reservations': reservations_data}), 200
+    return with_validators(jsonify({'reservations': reservations_data}), etag, last_modified), 200
 
 
 
@@ -397,11 +732,6 @@ def dashboard():
         Reservation.reservation_datetime >= datetime.utcnow()
     ).order_by(Reservation.reservation_datetime).limit(5).all()
 
-    # Prepare data for the chart
-    # Example: Count reservations by hour
-    from collections import Counter
-    import json
-
     # Filter reservations based on the selected time frame (e.g., today)
     time_frame = request.args.get('time_frame', 'today')
     if time_frame == 'today':
@@ -417,24 +747,19 @@ def dashboard():
         start_date = datetime.utcnow().date()
         end_date = start_date + timedelta(days=1)
 
-    # Get reservations in the time frame
-    chart_reservations = Reservation.query.filter_by(restaurant_id=user_restaurant.id).filter(
-        Reservation.reservation_datetime >= start_date,
-        Reservation.reservation_datetime < end_date
-    ).all()
-
-    # Count reservations by hour
-    reservation_hours = [res.reservation_datetime.hour for res in chart_reservations]
-    hour_counts = Counter(reservation_hours)
-    hours = list(range(24))
-    counts = [hour_counts.get(hour, 0) for hour in hours]
+    # Chart from the hourly rollup: by hour of day, by day or by week
+    granularity = request.args.get('granularity', 'hourly')
+    if granularity not in ('hourly', 'daily', 'weekly'):
+        granularity = 'hourly'
+    labels, counts = reservation_chart(user_restaurant.id, start_date, end_date, granularity)
 
     return render_template(
         'dashboard.html',
         reservations=reservations,
-        hours=json.dumps(hours),
+        hours=json.dumps(labels),
         counts=json.dumps(counts),
-        time_frame=time_frame
+        time_frame=time_frame,
+        granularity=granularity
     )
 
 
@@ -0,0 +1,231 @@
+# app/metrics.py
+
+import bisect
+import threading
+import time
+from collections import namedtuple
+from flask import current_app, g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from app import db
+
+Metric = namedtuple('Metric', 'type help labels buckets')
+
+# Upper bounds of the histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # Seconds
+CHECKOUT_BUCKETS = (0.0001, 0.001, 0.01, 0.1, 1, 5, 10, 30)  # Seconds
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)  # SQL statements per request
+
+METRICS = {
+    'http_requests_total': Metric(
+        'counter', 'Requests handled, by endpoint, method and status code.', ('endpoint', 'method', 'status'), None),
+    'http_request_duration_seconds': Metric(
+        'histogram', 'Time to build the response, by endpoint. Streamed bodies are not included.', ('endpoint',),
+        LATENCY_BUCKETS),
+    'http_request_sql_statements': Metric(
+        'histogram', 'SQL statements executed per request, by endpoint.', ('endpoint',), STATEMENT_BUCKETS),
+    'http_request_sql_duration_seconds': Metric(
+        'histogram', 'Time spent executing SQL per request, by endpoint.', ('endpoint',), LATENCY_BUCKETS),
+    'db_statements_total': Metric(
+        'counter', 'SQL statements executed, including background work and CLI commands.', (), None),
+    'db_statement_duration_seconds_total': Metric(
+        'counter', 'Time spent executing SQL statements.', (), None),
+    'db_pool_checkout_duration_seconds': Metric(
+        'histogram', 'Time waited for a pooled database connection, by bind.', ('bind',), CHECKOUT_BUCKETS),
+    'db_pool_checkout_timeouts_total': Metric(
+        'counter', 'Connection checkouts that gave up after the pool timeout, by bind.', ('bind',), None),
+    'db_pool_checked_out': Metric(
+        'gauge', 'Connections currently checked out of the pool, by bind.', ('bind',), None),
+    'geocode_lookups_total': Metric(
+        'counter', 'Address lookups by result: cached, found, not_found or error.', ('result',), None),
+    'geocoder_request_duration_seconds': Metric(
+        'histogram', 'Time of geocoder backend calls, by result.', ('result',), LATENCY_BUCKETS),
+}
+
+
+class Metrics:
+    """
+    Counters and histograms in the Prometheus text format.
+
+    Every thread records into its own dict, which only that thread writes to, so
+    recording takes no lock. A scrape sums the dicts of all threads; those of
+    threads that have exited are folded into one total and dropped.
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+        self.shards = []  # (thread, values) of each thread that recorded something
+        self.retired = {}  # Values of threads that have exited
+        self.fold_at = 64
+        self.gauges = []  # Callables yielding (name, labels, value) at scrape time
+        self.lock = threading.Lock()  # Guards shards and retired; never taken while recording
+
+    def _values(self):
+        try:
+            return self.local.values
+        except AttributeError:
+            values = self.local.values = {}
+            with self.lock:
+                self.shards.append((threading.current_thread(), values))
+                if len(self.shards) > self.fold_at:
+                    # Servers that start a thread per request would otherwise keep one dict per request
+                    self._fold_exited()
+                    self.fold_at = max(64, 2 * len(self.shards))
+            return values
+
+    def inc(self, name, labels=(), amount=1):
+        values = self._values()
+        key = (name, labels)
+        values[key] = values.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        """Add value to a histogram. It is kept as one count per bucket, then +Inf, then the sum."""
+        values = self._values()
+        buckets = METRICS[name].buckets
+        histogram = values.get((name, labels))
+        if histogram is None:
+            histogram = values[(name, labels)] = [0] * (len(buckets) + 2)
+        histogram[bisect.bisect_left(buckets, value)] += 1
+        histogram[-1] += value
+
+    def _fold_exited(self):
+        running = []
+        for thread, values in self.shards:
+            if thread.is_alive():
+                running.append((thread, values))
+            else:
+                _merge(self.retired, values)
+        self.shards = running
+
+    def collect(self):
+        """Current value of every series, keyed by (name, labels)."""
+        with self.lock:
+            self._fold_exited()
+            totals = {}
+            _merge(totals, self.retired)
+            for _, values in self.shards:
+                _merge(totals, dict(values))  # Copied in one step, while its thread may keep adding keys
+        for gauge in self.gauges:
+            for name, labels, value in gauge():
+                totals[(name, labels)] = value
+        return totals
+
+    def render(self):
+        series = {}
+        for (name, labels), value in self.collect().items():
+            series.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name, metric in METRICS.items():
+            if name not in series:
+                continue
+            lines.append(f'# HELP {name} {metric.help}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            for labels, value in sorted(series[name], key=lambda item: item[0]):
+                if metric.type != 'histogram':
+                    lines.append(f'{name}{_labels(metric.labels, labels)} {value}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets + ('+Inf',), value[:-1]):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_labels(metric.labels + ("le",), labels + (str(bound),))} {cumulative}')
+                lines.append(f'{name}_sum{_labels(metric.labels, labels)} {value[-1]}')
+                lines.append(f'{name}_count{_labels(metric.labels, labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+def _merge(totals, values):
+    for key, value in values.items():
+        if isinstance(value, list):
+            total = totals.get(key)
+            totals[key] = [a + b for a, b in zip(total, value)] if total else list(value)
+        else:
+            totals[key] = totals.get(key, 0) + value
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+def get_metrics():
+    return current_app.extensions['metrics']
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    g.sql_statements = 0
+    g.sql_seconds = 0.0
+
+
+def _record_request(response):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return response
+    metrics = get_metrics()
+    endpoint = request.endpoint or 'unmatched'
+    metrics.inc('http_requests_total', (endpoint, request.method, str(response.status_code)))
+    metrics.observe('http_request_duration_seconds', (endpoint,), time.perf_counter() - started)
+    metrics.observe('http_request_sql_statements', (endpoint,), g.sql_statements)
+    metrics.observe('http_request_sql_duration_seconds', (endpoint,), g.sql_seconds)
+    return response
+
+
+def statement_listeners(metrics):
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info['metrics_started'] = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['metrics_started']
+        metrics.inc('db_statements_total')
+        metrics.inc('db_statement_duration_seconds_total', (), elapsed)
+        if has_request_context() and 'metrics_started' in g:
+            g.sql_statements += 1
+            g.sql_seconds += elapsed
+
+    return before_cursor_execute, after_cursor_execute
+
+
+def time_checkouts(pool, bind, metrics):
+    """
+    Make pool record how long each checkout waits. SQLAlchemy has no event fired
+    before a checkout, so the pool's class is swapped for a subclass timing connect().
+    """
+    class TimedPool(type(pool)):
+        def connect(self):
+            started = time.perf_counter()
+            try:
+                return super().connect()
+            except PoolTimeout:
+                metrics.inc('db_pool_checkout_timeouts_total', (bind,))
+                raise
+            finally:
+                metrics.observe('db_pool_checkout_duration_seconds', (bind,), time.perf_counter() - started)
+
+    TimedPool.__name__ = f'Timed{type(pool).__name__}'
+    pool.__class__ = TimedPool
+
+
+def init_app(app):
+    metrics = app.extensions['metrics'] = Metrics()
+    # Registered before the other modules' hooks: runs first before a request and last after it
+    app.before_request(_start_request)
+    app.after_request(_record_request)
+
+    with app.app_context():
+        engines = dict(db.engines)
+    before_cursor_execute, after_cursor_execute = statement_listeners(metrics)
+    for bind, engine in engines.items():
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+        time_checkouts(engine.pool, bind or 'default', metrics)
+
+    def pool_gauges():
+        for bind, engine in engines.items():
+            checked_out = getattr(engine.pool, 'checkedout', None)  # QueuePool only
+            if checked_out is not None:
+                yield 'db_pool_checked_out', (bind or 'default',), checked_out()
+
+    metrics.gauges.append(pool_gauges)
@@ -2,6 +2,7 @@ from datetime import datetime
 from app import db, login_manager
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
+from sqlalchemy.orm import selectinload, joinedload
 
 # Association table between Restaurant and Category
 restaurant_categories = db.Table(
@@ -43,6 +44,17 @@ class Restaurant(db.Model):
     manager_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, unique=True)
     latitude = db.Column(db.Float, nullable=True) # Nullable for now
     longitude = db.Column(db.Float, nullable=True) # Nullable for now
+    # Background geocoding state: 'pending' until the queue fills in latitude/longitude, then 'done' or 'failed'
+    geocode_status = db.Column(db.String(20), nullable=False, default='pending', index=True)
+    geocode_attempts = db.Column(db.Integer, nullable=False, default=0)
+    geocode_next_attempt_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow)
+    # Capacity model used by the availability engine (see app/availability.py)
+    seat_capacity = db.Column(db.Integer, nullable=False, default=40)  # Seats available in every slot
+    slot_minutes = db.Column(db.Integer, nullable=False, default=30)  # Length of a booking slot
+    dining_minutes = db.Column(db.Integer, nullable=False, default=90)  # How long a reservation holds its seats
+    # Conditional GET validators (see app/versioning.py); version goes up on every UPDATE of the row
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, onupdate=db.literal_column('version') + 1)
     
     # Relationships
     categories = db.relationship(
@@ -52,7 +64,25 @@ class Restaurant(db.Model):
     )
     reservations = db.relationship('Reservation', back_populates='restaurant', cascade='all, delete-orphan')
     manager = db.relationship('User', back_populates='restaurant', uselist=False)
+    opening_hours = db.relationship('OpeningHours', back_populates='restaurant', cascade='all, delete-orphan')
     
+    def to_dict(self, include_reservations=False):
+        # Load lists with RESTAURANT_LIST_PROFILE to avoid per-row queries
+        data = {
+            'id': self.id,
+            'name': self.name,
+            'address': self.address,
+            'phoneNumber': self.phone_number,  # Changed to camelCase
+            'description': self.description,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'geocodingStatus': self.geocode_status,
+            'categories': [category.name for category in self.categories]
+        }
+        if include_reservations:
+            data['reservations'] = [reservation.to_dict() for reservation in self.reservations]
+        return data
+
     def __repr__(self):
         return f"<Restaurant {self.name}>"
 
@@ -60,6 +90,7 @@ class Category(db.Model):
     __tablename__ = 'categories'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False, unique=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationship to Restaurant
     restaurants = db.relationship(
@@ -91,6 +122,12 @@ class FrontendUser(db.Model):
 # added frontend_user_id to Reservation
 class Reservation(db.Model):
     __tablename__ = 'reservations'
+    __table_args__ = (
+        # manage_reservations, dashboard and my_reservations: one restaurant, filtered/sorted by time
+        db.Index('ix_reservations_restaurant_datetime', 'restaurant_id', 'reservation_datetime'),
+        # get_user_reservations: one frontend user, sorted by time
+        db.Index('ix_reservations_frontend_user_datetime', 'frontend_user_id', 'reservation_datetime'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     reservation_datetime = db.Column(db.DateTime, nullable=False)
@@ -100,11 +137,118 @@ class Reservation(db.Model):
     name = db.Column(db.String(100), nullable=False)
     status = db.Column(db.String(20), nullable=False, default='pending')
     frontend_user_id = db.Column(db.Integer, db.ForeignKey('frontend_users.id'), nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, onupdate=db.literal_column('version') + 1)
     
     restaurant = db.relationship('Restaurant', back_populates='reservations')
     frontend_user = db.relationship('FrontendUser', back_populates='reservations')
     
+    def to_dict(self):
+        # Shape used inside a restaurant's detail payload
+        return {
+            'id': self.id,
+            'reservationDatetime': self.reservation_datetime.isoformat(),
+            'personCount': self.person_count,
+            'status': self.status,
+            'name': self.name
+        }
+
+    def to_user_dict(self):
+        # Shape used by the frontend user's reservation list; load with USER_RESERVATIONS_PROFILE
+        return {
+            'reservation_id': self.id,
+            'restaurant_id': self.restaurant_id,
+            'restaurant_name': self.restaurant.name,
+            'reservation_datetime': self.reservation_datetime.isoformat(),
+            'person_count': self.person_count,
+            'status': self.status,
+            'name': self.name
+        }
+
     def __repr__(self):
         return f"<Reservation {self.id} for {self.name} at {self.reservation_datetime}>"
 
 
+# Weekly opening hours; a restaurant without any rows uses DEFAULT_OPENING_HOURS every day
+class OpeningHours(db.Model):
+    __tablename__ = 'opening_hours'
+
+    id = db.Column(db.Integer, primary_key=True)
+    restaurant_id = db.Column(db.Integer, db.ForeignKey('restaurants.id'), nullable=False, index=True)
+    weekday = db.Column(db.Integer, nullable=False)  # 0 = Monday ... 6 = Sunday
+    opens_at = db.Column(db.Time, nullable=False)
+    closes_at = db.Column(db.Time, nullable=False)  # Same day, after opens_at
+
+    restaurant = db.relationship('Restaurant', back_populates='opening_hours')
+
+    def __repr__(self):
+        return f"<OpeningHours {self.restaurant_id} day {self.weekday} {self.opens_at}-{self.closes_at}>"
+
+
+# Seats taken per restaurant per slot, kept up to date on every reservation flush
+class SlotOccupancy(db.Model):
+    __tablename__ = 'slot_occupancy'
+    __table_args__ = (
+        db.CheckConstraint('covers >= 0', name='ck_slot_occupancy_covers'),
+    )
+
+    restaurant_id = db.Column(db.Integer, db.ForeignKey('restaurants.id', ondelete='CASCADE'), primary_key=True)
+    slot_start = db.Column(db.DateTime, primary_key=True)
+    covers = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<SlotOccupancy {self.restaurant_id} {self.slot_start}: {self.covers}>"
+
+
+# Reservations per restaurant per hour, split by status and party size; kept up to date on every flush
+class ReservationHourlyStat(db.Model):
+    __tablename__ = 'reservation_hourly_stats'
+
+    restaurant_id = db.Column(db.Integer, db.ForeignKey('restaurants.id', ondelete='CASCADE'), primary_key=True)
+    hour_start = db.Column(db.DateTime, primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    party_size = db.Column(db.Integer, primary_key=True)
+    reservations = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.CheckConstraint('reservations > 0', name='ck_reservation_hourly_stats_reservations'),
+    )
+
+    def __repr__(self):
+        return f"<ReservationHourlyStat {self.restaurant_id} {self.hour_start} {self.status} x{self.party_size}: {self.reservations}>"
+
+
+# Replay protection for POST /api/reservations: one row per client request, expired rows are purged
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+
+    key = db.Column(db.String(64), primary_key=True)  # sha256 of the Idempotency-Key header (or user_id + timestamp)
+    reservation_id = db.Column(db.Integer, db.ForeignKey('reservations.id', ondelete='CASCADE'), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    reservation = db.relationship('Reservation')
+
+    def __repr__(self):
+        return f"<IdempotencyKey {self.key} -> {self.reservation_id}>"
+
+
+# Persistent cache for geocoding results, keyed by normalized address
+class GeocodeCache(db.Model):
+    __tablename__ = 'geocode_cache'
+
+    id = db.Column(db.Integer, primary_key=True)
+    address_key = db.Column(db.String(255), unique=True, nullable=False)  # See geocoding.normalize_address
+    latitude = db.Column(db.Float, nullable=True)  # NULL coordinates = address not found (negative entry)
+    longitude = db.Column(db.Float, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<GeocodeCache {self.address_key}>"
+
+
+# Eager-loading profiles for the JSON serializers: pass to .options(*PROFILE)
+# so each endpoint runs a fixed number of queries regardless of result size.
+RESTAURANT_LIST_PROFILE = (selectinload(Restaurant.categories),)
+USER_RESERVATIONS_PROFILE = (joinedload(Reservation.restaurant).load_only(Restaurant.name),)
+
+
@@ -0,0 +1,224 @@
+# app/profiler.py
+
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from flask import current_app, g, request, jsonify, before_render_template, template_rendered
+from sqlalchemy import event
+from app import db
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_ARG = '_profile'
+HOT_FRAMES = 25  # Frames listed in the JSON summary
+
+# Profiles of the requests being profiled, by thread. The SQL and template hooks
+# return at once while it is empty, so requests that are not profiled pay nothing.
+active = {}
+
+_switch_lock = threading.Lock()
+_sampling = 0
+_switch_interval = None
+
+
+def frame_name(code):
+    return f'{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class StackSampler(threading.Thread):
+    """Counts the call stacks of one thread, sampled every interval seconds."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True, name='request-profiler')
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.done = threading.Event()
+
+    def run(self):
+        while not self.done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+    def start(self):
+        # The sampler only runs when the profiled thread yields the GIL: shorten the
+        # switch interval to the sample interval while any request is profiled
+        global _sampling, _switch_interval
+        with _switch_lock:
+            if _sampling == 0:
+                _switch_interval = sys.getswitchinterval()
+                sys.setswitchinterval(min(_switch_interval, self.interval))
+            _sampling += 1
+        super().start()
+
+    def stop(self):
+        global _sampling
+        self.done.set()
+        self.join()
+        with _switch_lock:
+            _sampling -= 1
+            if _sampling == 0:
+                sys.setswitchinterval(_switch_interval)
+
+
+class RequestProfile:
+    """SQL statements, template renders and stack samples of one request."""
+
+    def __init__(self, interval):
+        self.id = f'{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}'
+        self.started = time.perf_counter()
+        self.duration = None
+        self.statements = {}  # SQL text -> [count, total seconds, max seconds]
+        self.templates = []  # (name, seconds)
+        self.rendering = []  # Start times of the templates being rendered
+        self.sampler = StackSampler(threading.get_ident(), interval)
+
+    def start(self):
+        active[self.sampler.thread_id] = self
+        self.sampler.start()
+
+    def stop(self):
+        if active.pop(self.sampler.thread_id, None) is self:
+            self.sampler.stop()
+            self.duration = time.perf_counter() - self.started
+
+    def add_statement(self, statement, seconds):
+        entry = self.statements.get(statement)
+        if entry is None:
+            entry = self.statements[statement] = [0, 0.0, 0.0]
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+
+    def collapsed(self):
+        """Stack samples in the collapsed format of flamegraph.pl, speedscope and similar tools."""
+        return ''.join(f'{";".join(stack)} {count}\n' for stack, count in self.sampler.stacks.most_common())
+
+    def hot_frames(self):
+        own, total = Counter(), Counter()
+        for stack, count in self.sampler.stacks.items():
+            own[stack[-1]] += count
+            for frame in set(stack):
+                total[frame] += count
+        return [{'frame': frame, 'selfSamples': own[frame], 'totalSamples': count}
+                for frame, count in sorted(total.items(), key=lambda item: (-own[item[0]], -item[1]))[:HOT_FRAMES]]
+
+    def summary(self, response):
+        statements = sorted(self.statements.items(), key=lambda item: -item[1][1])
+        return {
+            'id': self.id,
+            'endpoint': request.endpoint,
+            'method': request.method,
+            'path': request.full_path if request.query_string else request.path,
+            'status': response.status_code,
+            'durationMs': round(self.duration * 1000, 3),
+            'sql': {
+                'count': sum(entry[0] for _, entry in statements),
+                'durationMs': round(sum(entry[1] for _, entry in statements) * 1000, 3),
+                'statements': [{
+                    'statement': statement, 'count': count,
+                    'totalMs': round(total * 1000, 3), 'maxMs': round(longest * 1000, 3)
+                } for statement, (count, total, longest) in statements],
+            },
+            'templates': [{'name': name, 'durationMs': round(seconds * 1000, 3)} for name, seconds in self.templates],
+            'sampleIntervalMs': self.sampler.interval * 1000,
+            'samples': sum(self.sampler.stacks.values()),
+            'hotFrames': self.hot_frames(),
+        }
+
+
+def requested_profile(token):
+    """Whether the request carries the profiler token, in the X-Profile header or the _profile argument."""
+    given = request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_ARG)
+    return given is not None and hmac.compare_digest(given, token)
+
+
+def _current_profile():
+    return active.get(threading.get_ident()) if active else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if active and threading.get_ident() in active:
+        conn.info['profile_started'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile()
+    if profile is not None and 'profile_started' in conn.info:
+        profile.add_statement(statement, time.perf_counter() - conn.info.pop('profile_started'))
+
+
+def _before_render(app, template, context, **extra):
+    profile = _current_profile()
+    if profile is not None:
+        profile.rendering.append(time.perf_counter())
+
+
+def _rendered(app, template, context, **extra):
+    profile = _current_profile()
+    if profile is not None and profile.rendering:
+        profile.templates.append((template.name, time.perf_counter() - profile.rendering.pop()))
+
+
+def _start_profile():
+    if requested_profile(current_app.config['PROFILER_TOKEN']):
+        g.profile = RequestProfile(current_app.config['PROFILER_SAMPLE_INTERVAL'])
+        g.profile.start()
+
+
+def _finish_profile(response):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return response
+    profile.stop()
+    summary = profile.summary(response)
+
+    directory = current_app.config['PROFILER_OUTPUT_DIR']
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f'{profile.id}.collapsed'), 'w') as f:
+        f.write(profile.collapsed())
+    with open(os.path.join(directory, f'{profile.id}.json'), 'w') as f:
+        json.dump(summary, f, indent=2)
+
+    if request.args.get('_profile_format') == 'json':
+        response = jsonify(summary)
+    response.headers['X-Profile-Id'] = profile.id
+    response.headers['Server-Timing'] = (
+        f'total;dur={summary["durationMs"]}, '
+        f'sql;dur={summary["sql"]["durationMs"]};desc="{summary["sql"]["count"]} statements", '
+        f'template;dur={round(sum(seconds for _, seconds in profile.templates) * 1000, 3)}'
+    )
+    return response
+
+
+def _discard_profile(exc):
+    # Stops the sampler if the response never reached _finish_profile
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profile.stop()
+
+
+def init_app(app):
+    # Without a token nothing is registered, so the profiler costs nothing at all
+    if not app.config['PROFILER_TOKEN']:
+        return
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    app.teardown_request(_discard_profile)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+    with app.app_context():
+        for engine in db.engines.values():
+            if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+                event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
@@ -0,0 +1,50 @@
+# app/replicas.py
+
+import time
+from flask import g, request, has_request_context
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND = 'replica'
+STICKY_COOKIE = 'read_primary_until'
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PRIMARY = {'primary': True}  # bind_arguments keeping a read on the primary, e.g. for in-process indexes
+
+
+class RoutingSession(Session):
+    """
+    Sends the reads of GET requests to the 'replica' bind when one is configured.
+    Flushes and Core INSERT/UPDATE/DELETE statements always go to the primary,
+    as does everything outside a request (CLI commands, background workers) and
+    any read executed with bind_arguments=PRIMARY.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not getattr(clause, 'is_dml', False) \
+                and not kwargs.get('primary') and has_request_context() and g.get('read_replica'):
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _route_request():
+    # Read-your-writes: a client that just wrote reads from the primary until the replica caught up
+    try:
+        sticky = float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        sticky = False
+    g.read_replica = request.method in READ_METHODS and not sticky
+
+
+def _make_sticky(app):
+    def after_request(response):
+        if request.method not in READ_METHODS and response.status_code < 400:
+            sticky_seconds = app.config['REPLICA_STICKY_SECONDS']
+            response.set_cookie(STICKY_COOKIE, str(time.time() + sticky_seconds), max_age=sticky_seconds, httponly=True)
+        return response
+    return after_request
+
+
+def init_app(app):
+    if REPLICA_BIND not in app.config['SQLALCHEMY_BINDS']:
+        return
+    app.before_request(_route_request)
+    app.after_request(_make_sticky(app))
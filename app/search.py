@@ -0,0 +1,152 @@
+# app/search.py
+
+import re
+from sqlalchemy import event, inspect, or_, select, text, bindparam, DDL
+from app import db
+
+SEARCH_TABLE = 'restaurant_search'
+MAX_QUERY_TERMS = 8
+
+# FTS5 index over the searchable text of each restaurant, keyed by rowid = restaurants.id.
+# The prefix option keeps 2- and 3-letter prefix queries from scanning the whole term list.
+CREATE_SEARCH_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "name, description, address, categories, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+DROP_SEARCH_TABLE = f'DROP TABLE IF EXISTS {SEARCH_TABLE}'
+
+# Run by db.create_all() and drop_all() alongside the restaurants table
+_create_search_table = DDL(CREATE_SEARCH_TABLE).execute_if(dialect='sqlite')
+_drop_search_table = DDL(DROP_SEARCH_TABLE).execute_if(dialect='sqlite')
+
+# bm25 weight of each column, in table order: a hit in the name outranks one in the description
+COLUMN_WEIGHTS = (10.0, 1.0, 2.0, 5.0)
+
+SEARCHED_ATTRIBUTES = ('name', 'description', 'address', 'categories')
+
+INDEX_ROWS = f"""
+    INSERT INTO {SEARCH_TABLE} (rowid, name, description, address, categories)
+    SELECT restaurants.id, restaurants.name, restaurants.description, restaurants.address,
+           coalesce(group_concat(categories.name, ' '), '')
+    FROM restaurants
+    LEFT JOIN restaurant_categories ON restaurant_categories.restaurant_id = restaurants.id
+    LEFT JOIN categories ON categories.id = restaurant_categories.category_id
+"""
+
+
+def match_expression(query):
+    """
+    FTS5 query matching every word of query as a prefix. Each word is also matched
+    whole, so that bm25 ranks "Bar 1" above "Bar 12" for 'bar 1':
+    'pizza nap' -> '("pizza" OR "pizza"*) AND ("nap" OR "nap"*)'.
+    """
+    terms = re.findall(r'\w+', query.lower())[:MAX_QUERY_TERMS]
+    return ' AND '.join(f'("{term}" OR "{term}"*)' for term in terms)
+
+
+def uses_fts(connection):
+    return connection.dialect.name == 'sqlite'
+
+
+def search_restaurant_ids(query, limit, offset=0):
+    """Ids of restaurants matching every word of query, best match first."""
+    from app.models import Restaurant, Category
+
+    expression = match_expression(query)
+    if not expression:
+        return []
+    if uses_fts(db.session.connection()):
+        weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+        return db.session.scalars(text(
+            f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :expression '
+            f'ORDER BY bm25({SEARCH_TABLE}, {weights}), rowid LIMIT :limit OFFSET :offset'
+        ), {'expression': expression, 'limit': limit, 'offset': offset}).all()
+
+    # Other databases: unranked substring matching, so the endpoint keeps working without FTS5
+    statement = select(Restaurant.id)
+    for term in re.findall(r'\w+', query.lower())[:MAX_QUERY_TERMS]:
+        pattern = f'%{term}%'
+        statement = statement.where(or_(
+            Restaurant.name.ilike(pattern), Restaurant.description.ilike(pattern), Restaurant.address.ilike(pattern),
+            Restaurant.categories.any(Category.name.ilike(pattern))
+        ))
+    return db.session.scalars(statement.order_by(Restaurant.name, Restaurant.id).limit(limit).offset(offset)).all()
+
+
+def reindex(connection, restaurant_ids):
+    """Replace the search rows of restaurant_ids with their current text; deleted restaurants just drop out."""
+    if not restaurant_ids or not uses_fts(connection):
+        return
+    ids = bindparam('ids', expanding=True)
+    connection.execute(text(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN :ids').bindparams(ids), {'ids': list(restaurant_ids)})
+    connection.execute(
+        text(INDEX_ROWS + ' WHERE restaurants.id IN :ids GROUP BY restaurants.id').bindparams(ids),
+        {'ids': list(restaurant_ids)}
+    )
+
+
+def rebuild_index():
+    """Recompute the whole search index (backfill, or after Core inserts that bypass the session hooks)."""
+    connection = db.session.connection()
+    if not uses_fts(connection):
+        return 0
+    connection.execute(text(f'DELETE FROM {SEARCH_TABLE}'))
+    connection.execute(text(INDEX_ROWS + ' GROUP BY restaurants.id'))
+    count = connection.execute(text(f'SELECT count(*) FROM {SEARCH_TABLE}')).scalar()
+    db.session.commit()
+    return count
+
+
+def _before_flush(session, flush_context, instances):
+    # Members of a deleted category are only known before its links are deleted
+    from app.models import Category
+
+    for obj in session.deleted:
+        if isinstance(obj, Category):
+            session.info.setdefault('search_reindex', set()).update(restaurant.id for restaurant in obj.restaurants)
+
+
+def _after_flush(session, flush_context):
+    """Reindex the restaurants whose searchable text changed, in the same transaction."""
+    from app.models import Restaurant, Category, restaurant_categories
+
+    restaurant_ids = session.info.pop('search_reindex', set())
+    renamed_categories = []
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, Restaurant):
+            state = inspect(obj)
+            if obj in session.new or obj in session.deleted or any(
+                state.attrs[key].history.has_changes() for key in SEARCHED_ATTRIBUTES
+            ):
+                restaurant_ids.add(obj.id)
+        elif isinstance(obj, Category) and obj in session.dirty and inspect(obj).attrs.name.history.has_changes():
+            renamed_categories.append(obj.id)
+
+    connection = session.connection()
+    if renamed_categories and uses_fts(connection):
+        restaurant_ids.update(connection.scalars(
+            select(restaurant_categories.c.restaurant_id).where(restaurant_categories.c.category_id.in_(renamed_categories))
+        ))
+    reindex(connection, restaurant_ids)
+
+
+def include_name(name, type_, parent_names):
+    """Keeps autogenerate from proposing to drop the FTS5 table and its shadow tables."""
+    return not (type_ == 'table' and name.startswith(SEARCH_TABLE))
+
+
+def init_app(app):
+    from app.models import Restaurant
+
+    if not event.contains(Restaurant.__table__, 'after_create', _create_search_table):
+        event.listen(Restaurant.__table__, 'after_create', _create_search_table)
+        event.listen(Restaurant.__table__, 'before_drop', _drop_search_table)
+    if not event.contains(db.session, 'before_flush', _before_flush):
+        event.listen(db.session, 'before_flush', _before_flush)
+        event.listen(db.session, 'after_flush', _after_flush)
+    app.extensions['migrate'].configure_args.setdefault('include_name', include_name)
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Rebuild the restaurant full-text search index."""
+        print(f'Indexed {rebuild_index()} restaurants for search.')
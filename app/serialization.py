@@ -0,0 +1,65 @@
+# app/serialization.py
+
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.utils import import_string
+
+try:
+    import orjson
+except ImportError:  # Optional: without it the 'orjson' provider is the standard library one
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON provider encoding with orjson, with the output of DefaultJSONProvider:
+    sorted keys, dates as HTTP dates, Decimal, UUID and Markup through the same
+    default, and indentation in debug mode. Non-ASCII text is written as UTF-8
+    instead of \\u escapes. Values orjson refuses (e.g. integers beyond 64 bits)
+    are encoded by the json module.
+    """
+
+    def _encode(self, obj, option=0):
+        option |= orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=self.default, option=option)
+        except orjson.JSONEncodeError:
+            return None
+
+    def dumps(self, obj, **kwargs):
+        if not kwargs:
+            encoded = self._encode(obj)
+            if encoded is not None:
+                return encoded.decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if not kwargs:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                pass  # Let the json module accept what it can, or raise its usual error
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = orjson.OPT_APPEND_NEWLINE
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        body = self._encode(obj, option)
+        if body is None:
+            return super().response(obj)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+JSON_PROVIDERS = {
+    'orjson': OrjsonProvider if orjson is not None else DefaultJSONProvider,
+    'stdlib': DefaultJSONProvider,
+}
+
+
+def init_app(app):
+    provider = app.config['JSON_PROVIDER']
+    provider_class = JSON_PROVIDERS[provider] if provider in JSON_PROVIDERS else import_string(provider)
+    app.json = provider_class(app)
@@ -0,0 +1,259 @@
+# app/stats.py
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from flask import current_app
+from sqlalchemy import event, select, update, insert, delete, func, Float, Date
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from app import db
+from app.database import upsert
+from app.availability import reservation_contributions, OCCUPYING_STATUSES
+
+
+class epoch_seconds(FunctionElement):
+    """Seconds since the epoch of a DateTime column, portable across SQLite and PostgreSQL."""
+    type = Float()
+    inherit_cache = True
+
+
+@compiles(epoch_seconds)
+def _compile_epoch_seconds(element, compiler, **kw):
+    return 'EXTRACT(EPOCH FROM %s)' % compiler.process(element.clauses, **kw)
+
+
+@compiles(epoch_seconds, 'sqlite')
+def _compile_epoch_seconds_sqlite(element, compiler, **kw):
+    return '(julianday(%s) * 86400.0)' % compiler.process(element.clauses, **kw)
+
+
+class day_of(FunctionElement):
+    """Calendar date of a DateTime column."""
+    type = Date()
+    inherit_cache = True
+
+
+@compiles(day_of)
+def _compile_day_of(element, compiler, **kw):
+    return 'CAST(%s AS DATE)' % compiler.process(element.clauses, **kw)
+
+
+@compiles(day_of, 'sqlite')
+def _compile_day_of_sqlite(element, compiler, **kw):
+    return 'date(%s)' % compiler.process(element.clauses, **kw)
+
+
+def hour_floor(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_deltas(contributions):
+    """Net change in reservation counts per (restaurant_id, hour_start, status, party_size)."""
+    deltas = defaultdict(int)
+    for restaurant_id, start, person_count, status, sign in contributions:
+        if restaurant_id is None or start is None:
+            continue
+        deltas[(restaurant_id, hour_floor(start), status, int(person_count))] += sign
+    return deltas
+
+
+def apply_rollup(connection, deltas):
+    """
+    Add deltas to the rollup rows. Positive deltas are an INSERT ... ON CONFLICT DO
+    UPDATE, so concurrent transactions creating the same row add up instead of
+    colliding on the primary key. A row whose count drops to zero is deleted, and
+    a negative delta never creates one: a row holding fewer reservations than are
+    taken away means the rollup drifted, so it is dropped and logged.
+    """
+    from app.models import ReservationHourlyStat as Stat
+    for (restaurant_id, hour_start, status, party_size), delta in deltas.items():
+        if not delta:
+            continue
+        if delta > 0:
+            added = upsert(connection, Stat.__table__).values(
+                restaurant_id=restaurant_id, hour_start=hour_start, status=status,
+                party_size=party_size, reservations=delta
+            )
+            connection.execute(added.on_conflict_do_update(
+                index_elements=['restaurant_id', 'hour_start', 'status', 'party_size'],
+                set_={'reservations': Stat.reservations + added.excluded.reservations}
+            ))
+            continue
+        row = (Stat.restaurant_id == restaurant_id, Stat.hour_start == hour_start,
+               Stat.status == status, Stat.party_size == party_size)
+        statement = update(Stat).where(*row).values(reservations=Stat.reservations + delta)
+        if connection.execute(statement.where(Stat.reservations + delta > 0)).rowcount == 1:
+            continue
+        if connection.execute(delete(Stat).where(*row, Stat.reservations + delta == 0)).rowcount == 1:
+            continue
+        current_app.logger.warning(f'reservation_hourly_stats of restaurant {restaurant_id} at {hour_start} ({status}, party of {party_size}) is behind by more than {-delta} reservations; row dropped (run flask rebuild-stats)')
+        connection.execute(delete(Stat).where(*row))
+
+
+def _after_flush(session, flush_context):
+    # Same transaction as the reservation writes, so the rollup never drifts
+    apply_rollup(session.connection(), rollup_deltas(reservation_contributions(session)))
+
+
+def hourly_counts(restaurant_id, start, end):
+    """{hour_start: reservations} for a restaurant between two datetimes, all statuses."""
+    from app.models import ReservationHourlyStat as Stat
+    return dict(db.session.execute(
+        select(Stat.hour_start, func.sum(Stat.reservations)).where(
+            Stat.restaurant_id == restaurant_id,
+            Stat.hour_start >= start,
+            Stat.hour_start < end
+        ).group_by(Stat.hour_start)
+    ).all())
+
+
+def reservation_chart(restaurant_id, start_date, end_date, granularity):
+    """
+    Chart labels and counts from the hourly rollup: 'hourly' buckets by hour of day,
+    'daily' by date and 'weekly' by week starting at start_date.
+    """
+    start = datetime.combine(start_date, time())
+    end = datetime.combine(end_date, time())
+    counts = hourly_counts(restaurant_id, start, end)
+
+    if granularity == 'daily':
+        days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days)]
+        totals = defaultdict(int)
+        for hour_start, count in counts.items():
+            totals[hour_start.date()] += count
+        return [day.isoformat() for day in days], [totals[day] for day in days]
+
+    if granularity == 'weekly':
+        weeks = [start_date + timedelta(weeks=i) for i in range(-(-(end_date - start_date).days // 7))]
+        totals = defaultdict(int)
+        for hour_start, count in counts.items():
+            totals[(hour_start.date() - start_date).days // 7] += count
+        return [week.isoformat() for week in weeks], [totals[i] for i in range(len(weeks))]
+
+    totals = defaultdict(int)
+    for hour_start, count in counts.items():
+        totals[hour_start.hour] += count
+    hours = list(range(24))
+    return hours, [totals[hour] for hour in hours]
+
+
+def _ratio(part, whole):
+    return round(part / whole, 4) if whole else None
+
+
+def summarize(status_counts, covers, lead_time_seconds):
+    """Derived metrics from per-status reservation counts."""
+    accepted = status_counts.get('accepted', 0)
+    declined = status_counts.get('declined', 0)
+    no_shows = status_counts.get('no_show', 0)
+    return {
+        'reservations': sum(status_counts.values()),
+        'covers': covers,
+        'status_counts': status_counts,
+        'accept_ratio': _ratio(accepted, accepted + declined),
+        'decline_ratio': _ratio(declined, accepted + declined),
+        'no_show_rate': _ratio(no_shows, accepted + no_shows),
+        'average_lead_time_hours': round(lead_time_seconds / 3600, 2) if lead_time_seconds is not None else None,
+    }
+
+
+def restaurant_stats(restaurant_id, start, end):
+    """
+    Reservation analytics for one restaurant between two datetimes, computed with
+    GROUP BY aggregates: counts and covers from the hourly rollup, lead time
+    (reservation_datetime - timestamp) from the reservations table.
+    """
+    from app.models import Reservation, ReservationHourlyStat as Stat
+
+    in_range = (Stat.restaurant_id == restaurant_id, Stat.hour_start >= start, Stat.hour_start < end)
+    status_counts = dict(db.session.execute(
+        select(Stat.status, func.sum(Stat.reservations)).where(*in_range)
+        .group_by(Stat.status).having(func.sum(Stat.reservations) > 0)
+    ).all())
+    covers_per_day = db.session.execute(
+        select(day_of(Stat.hour_start).label('day'), func.sum(Stat.reservations * Stat.party_size))
+        .where(*in_range, Stat.status.in_(OCCUPYING_STATUSES))
+        .group_by('day').order_by('day')
+    ).all()
+    lead_time = db.session.execute(
+        select(func.avg(epoch_seconds(Reservation.reservation_datetime) - epoch_seconds(Reservation.timestamp)))
+        .where(Reservation.restaurant_id == restaurant_id,
+               Reservation.reservation_datetime >= start, Reservation.reservation_datetime < end)
+    ).scalar()
+
+    data = summarize(status_counts, sum(covers for _, covers in covers_per_day), lead_time)
+    data['covers_per_day'] = [{'date': str(day), 'covers': covers} for day, covers in covers_per_day]
+    return data
+
+
+def category_stats(start, end):
+    """The same analytics per category, grouped in the database across each category's restaurants."""
+    from app.models import Category, Reservation, ReservationHourlyStat as Stat, restaurant_categories
+
+    link = restaurant_categories.c
+    in_range = (Stat.hour_start >= start, Stat.hour_start < end)
+    counts = db.session.execute(
+        select(link.category_id, Stat.status, func.sum(Stat.reservations))
+        .join(Stat, Stat.restaurant_id == link.restaurant_id)
+        .where(*in_range)
+        .group_by(link.category_id, Stat.status).having(func.sum(Stat.reservations) > 0)
+    ).all()
+    daily_covers = db.session.execute(
+        select(link.category_id, day_of(Stat.hour_start).label('day'), func.sum(Stat.reservations * Stat.party_size))
+        .join(Stat, Stat.restaurant_id == link.restaurant_id)
+        .where(*in_range, Stat.status.in_(OCCUPYING_STATUSES))
+        .group_by(link.category_id, 'day').order_by(link.category_id, 'day')
+    ).all()
+    lead_times = dict(db.session.execute(
+        select(link.category_id, func.avg(epoch_seconds(Reservation.reservation_datetime) - epoch_seconds(Reservation.timestamp)))
+        .join(Reservation, Reservation.restaurant_id == link.restaurant_id)
+        .where(Reservation.reservation_datetime >= start, Reservation.reservation_datetime < end)
+        .group_by(link.category_id)
+    ).all())
+
+    status_counts = defaultdict(dict)
+    for category_id, status, reservations in counts:
+        status_counts[category_id][status] = reservations
+    covers_per_day = defaultdict(list)
+    for category_id, day, covers in daily_covers:
+        covers_per_day[category_id].append({'date': str(day), 'covers': covers})
+
+    data = []
+    for category_id, name in db.session.execute(select(Category.id, Category.name).order_by(Category.id)):
+        days = covers_per_day[category_id]
+        item = {'category_id': category_id, 'name': name}
+        item.update(summarize(status_counts[category_id], sum(day['covers'] for day in days), lead_times.get(category_id)))
+        item['covers_per_day'] = days
+        data.append(item)
+    return data
+
+
+def rebuild_rollup():
+    """Recompute reservation_hourly_stats from the reservations table (backfill)."""
+    from app.models import Reservation, ReservationHourlyStat
+
+    rows = db.session.execute(
+        select(Reservation.restaurant_id, Reservation.reservation_datetime, Reservation.person_count, Reservation.status)
+        .execution_options(yield_per=5000)
+    )
+    deltas = rollup_deltas((restaurant_id, start, person_count, status, 1) for restaurant_id, start, person_count, status in rows)
+
+    db.session.execute(delete(ReservationHourlyStat))
+    if deltas:
+        db.session.execute(insert(ReservationHourlyStat), [
+            {'restaurant_id': restaurant_id, 'hour_start': hour_start, 'status': status,
+             'party_size': party_size, 'reservations': count}
+            for (restaurant_id, hour_start, status, party_size), count in deltas.items()
+        ])
+    db.session.commit()
+    return len(deltas)
+
+
+def init_app(app):
+    if not event.contains(db.session, 'after_flush', _after_flush):
+        event.listen(db.session, 'after_flush', _after_flush)
+
+    @app.cli.command('rebuild-stats')
+    def rebuild_stats_command():
+        """Rebuild the hourly reservation rollup from all reservations."""
+        print(f'Rebuilt {rebuild_rollup()} hourly reservation stat rows.')
@@ -0,0 +1,94 @@
+# app/versioning.py
+
+import hashlib
+from datetime import datetime
+from flask import request, current_app
+from sqlalchemy import event, inspect, select, func
+from werkzeug.http import is_resource_modified
+from app import db
+
+
+def make_etag(*parts):
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def latest(*moments):
+    moments = [moment for moment in moments if moment is not None]
+    return max(moments) if moments else None
+
+
+def restaurant_with_validators(restaurant_id):
+    """
+    (restaurant, etag, last_modified) for the detail payload of a restaurant, in one
+    query, or None if it does not exist. The validators cover the restaurant row, its
+    categories and its reservations; categories and reservations are not loaded.
+    """
+    from app.models import Restaurant, Category, Reservation, restaurant_categories
+
+    reservations = select(Reservation).where(Reservation.restaurant_id == Restaurant.id)
+    row = db.session.execute(
+        select(
+            Restaurant,
+            reservations.with_only_columns(func.count(Reservation.id)).scalar_subquery(),
+            reservations.with_only_columns(func.sum(Reservation.version)).scalar_subquery(),
+            reservations.with_only_columns(func.max(Reservation.updated_at)).scalar_subquery(),
+            select(func.max(Category.updated_at)).join(
+                restaurant_categories, restaurant_categories.c.category_id == Category.id
+            ).where(restaurant_categories.c.restaurant_id == Restaurant.id).scalar_subquery(),
+        ).where(Restaurant.id == restaurant_id)
+    ).first()
+    if row is None:
+        return None
+    restaurant, count, version_sum, reservations_updated_at, categories_updated_at = row
+    etag = make_etag(restaurant.id, restaurant.version, count, version_sum, reservations_updated_at, categories_updated_at)
+    return restaurant, etag, latest(restaurant.updated_at, reservations_updated_at, categories_updated_at)
+
+
+def user_reservations_validators(user_id):
+    """
+    (frontend_user_id, etag, last_modified) for a frontend user's reservation list, in one
+    query, or None if the user does not exist. Covers the reservations and the names of
+    their restaurants.
+    """
+    from app.models import FrontendUser, Reservation, Restaurant
+
+    row = db.session.execute(
+        select(
+            FrontendUser.id, func.count(Reservation.id), func.sum(Reservation.version),
+            func.max(Reservation.updated_at), func.max(Restaurant.updated_at)
+        ).outerjoin(Reservation, Reservation.frontend_user_id == FrontendUser.id)
+        .outerjoin(Restaurant, Restaurant.id == Reservation.restaurant_id)
+        .where(FrontendUser.user_id == user_id)
+        .group_by(FrontendUser.id)
+    ).first()
+    if row is None:
+        return None
+    frontend_user_id, count, version_sum, reservations_updated_at, restaurants_updated_at = row
+    etag = make_etag(frontend_user_id, count, version_sum, reservations_updated_at, restaurants_updated_at)
+    return frontend_user_id, etag, latest(reservations_updated_at, restaurants_updated_at)
+
+
+def not_modified(etag, last_modified):
+    """A 304 response if the client's If-None-Match / If-Modified-Since still match, else None."""
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    return with_validators(current_app.response_class(status=304), etag, last_modified)
+
+
+def with_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    return response
+
+
+def _before_flush(session, flush_context, instances):
+    # Category links live in restaurant_categories; touch the restaurant so its version moves too
+    from app.models import Restaurant
+    for obj in session.dirty:
+        if isinstance(obj, Restaurant) and inspect(obj).attrs.categories.history.has_changes():
+            obj.updated_at = datetime.utcnow()
+
+
+def init_app(app):
+    if not event.contains(db.session, 'before_flush', _before_flush):
+        event.listen(db.session, 'before_flush', _before_flush)
@@ -0,0 +1,222 @@
+# benchmarks/api_load.py
+#
+# Replays a realistic mix of API requests against a generated dataset (see
+# seed.generate) and reports, per endpoint, throughput, p50/p95/p99 latency,
+# SQL queries per request and status codes as JSON. Runs offline on an
+# in-memory database, or on a SQLite file with --database.
+#
+#   python -m benchmarks.api_load --restaurants 1000 --reservations 1000000 --requests 5000 --output report.json
+#
+# Pass an earlier report as --baseline to fail (exit code 1) when an endpoint got
+# slower than --tolerance allows or started running more queries.
+
+import argparse
+import json
+import random
+import sys
+import time
+from collections import Counter
+from datetime import date, timedelta
+from sqlalchemy import event, func
+from app import create_app, db
+from app.models import Restaurant, FrontendUser, Reservation
+from config import TestingConfig
+from seed import generate
+
+# Relative weight of each endpoint in the replayed traffic
+DEFAULT_MIX = {
+    'GET /api/restaurants': 30,
+    'GET /api/restaurants/<id>': 45,
+    'POST /api/reservations': 15,
+    'PATCH /api/reservations/<id>': 10,
+}
+
+# Status codes that count as a handled request; 409 is a full slot
+EXPECTED_STATUSES = {
+    'GET /api/restaurants': (200,),
+    'GET /api/restaurants/<id>': (200,),
+    'POST /api/reservations': (201, 409),
+    'PATCH /api/reservations/<id>': (200, 409),
+}
+
+
+def make_config(path, response_cache):
+    class LoadConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + path if path else 'sqlite://'
+        RESPONSE_CACHE_BACKEND = response_cache
+    return LoadConfig
+
+
+def parse_mix(value):
+    mix = dict(DEFAULT_MIX)
+    for item in value.split(','):
+        if item:
+            label, _, weight = item.rpartition('=')
+            if label not in mix:
+                raise argparse.ArgumentTypeError(f'unknown endpoint {label!r}, expected one of {", ".join(mix)}')
+            mix[label] = int(weight)
+    return mix
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of an already sorted list."""
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Traffic:
+    """Builds the requests of each endpoint from a seeded RNG."""
+
+    def __init__(self, rng, restaurant_ids, user_ids, max_reservation_id):
+        self.rng = rng
+        self.restaurant_ids = restaurant_ids
+        self.user_ids = user_ids
+        self.max_reservation_id = max_reservation_id
+        self.posted = 0
+
+    def request(self, label):
+        rng = self.rng
+        if label == 'GET /api/restaurants':
+            return 'GET', '/api/restaurants', None
+        if label == 'GET /api/restaurants/<id>':
+            return 'GET', f'/api/restaurants/{rng.choice(self.restaurant_ids)}', None
+        if label == 'POST /api/reservations':
+            self.posted += 1
+            day = date.today() + timedelta(days=rng.randint(1, 60))
+            return 'POST', '/api/reservations', {
+                'restaurant_id': rng.choice(self.restaurant_ids), 'name': f'Load Guest {self.posted}',
+                'date': day.isoformat(), 'time': f'{rng.randint(12, 21)}:{rng.choice(("00", "30"))}',
+                'number_of_people': rng.randint(1, 6), 'timestamp': f'2030-01-01T12:00:{self.posted % 60:02d}Z',
+                'user_id': rng.choice(self.user_ids) if self.user_ids and rng.random() < 0.8 else f'load_{self.posted}',
+            }
+        return 'PATCH', f'/api/reservations/{rng.randint(1, self.max_reservation_id)}', {
+            'status': rng.choice(('accepted', 'declined', 'no_show'))
+        }
+
+
+def run(args):
+    app = create_app(make_config(args.database, args.response_cache))
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        generate(args.restaurants, args.categories, args.users, args.reservations, args.seed)
+        generated_in = time.perf_counter() - started
+        restaurant_ids = db.session.scalars(db.select(Restaurant.id)).all()
+        user_ids = db.session.scalars(db.select(FrontendUser.user_id)).all()
+        max_reservation_id = db.session.scalar(db.select(func.max(Reservation.id))) or 1
+        db.session.remove()
+        engine = db.engine
+
+    statements = [0]
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements[0] += 1
+
+    event.listen(engine, 'before_cursor_execute', count_statement)
+
+    rng = random.Random(args.seed)
+    traffic = Traffic(rng, restaurant_ids, user_ids, max_reservation_id)
+    labels, weights = list(args.mix), list(args.mix.values())
+    samples = {label: [] for label in labels}
+    client = app.test_client()
+
+    for i in range(args.warmup + args.requests):
+        label = rng.choices(labels, weights)[0]
+        method, url, payload = traffic.request(label)
+        statements[0] = 0
+        started = time.perf_counter()
+        response = client.open(url, method=method, json=payload)
+        elapsed = time.perf_counter() - started
+        if i >= args.warmup:
+            samples[label].append((elapsed, statements[0], response.status_code))
+    event.remove(engine, 'before_cursor_execute', count_statement)
+
+    endpoints = {}
+    for label, rows in samples.items():
+        if not rows:
+            continue
+        timings = sorted(elapsed * 1000 for elapsed, _, _ in rows)
+        queries = [count for _, count, _ in rows]
+        statuses = Counter(status for _, _, status in rows)
+        endpoints[label] = {
+            'requests': len(rows),
+            'requests_per_s': round(len(rows) / (sum(timings) / 1000), 1),
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            'p50_ms': round(percentile(timings, 0.50), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'queries_mean': round(sum(queries) / len(queries), 2),
+            'queries_max': max(queries),
+            'status_codes': {str(status): count for status, count in sorted(statuses.items())},
+            'errors': sum(count for status, count in statuses.items() if status not in EXPECTED_STATUSES[label]),
+        }
+
+    total_seconds = sum(endpoint['requests'] / endpoint['requests_per_s'] for endpoint in endpoints.values())
+    return {
+        'dataset': {
+            'restaurants': args.restaurants, 'categories': args.categories, 'frontend_users': args.users,
+            'reservations': args.reservations, 'seed': args.seed, 'generated_in_s': round(generated_in, 2),
+        },
+        'settings': {
+            'database': args.database or ':memory:', 'response_cache': args.response_cache,
+            'warmup': args.warmup, 'mix': args.mix,
+        },
+        'total': {
+            'requests': args.requests,
+            'requests_per_s': round(args.requests / total_seconds, 1),
+            'errors': sum(endpoint['errors'] for endpoint in endpoints.values()),
+        },
+        'endpoints': endpoints,
+    }
+
+
+def regressions(report, baseline, tolerance):
+    """Endpoints whose p95 latency grew beyond tolerance, or that run more queries than in the baseline."""
+    found = []
+    for label, before in baseline['endpoints'].items():
+        after = report['endpoints'].get(label)
+        if after is None:
+            continue
+        if after['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            found.append(f'{label}: p95 {before["p95_ms"]}ms -> {after["p95_ms"]}ms')
+        if after['queries_max'] > before['queries_max']:
+            found.append(f'{label}: queries {before["queries_max"]} -> {after["queries_max"]}')
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay an API request mix and report latency per endpoint.')
+    parser.add_argument('--restaurants', type=int, default=100)
+    parser.add_argument('--categories', type=int, default=20)
+    parser.add_argument('--users', type=int, default=1000, help='frontend users')
+    parser.add_argument('--reservations', type=int, default=50000)
+    parser.add_argument('--requests', type=int, default=2000, help='measured requests')
+    parser.add_argument('--warmup', type=int, default=200, help='requests replayed before measuring')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help='endpoint weights, e.g. "GET /api/restaurants=50,PATCH /api/reservations/<id>=0"')
+    parser.add_argument('--seed', type=int, default=0, help='RNG seed of the dataset and the request mix')
+    parser.add_argument('--database', help='new SQLite file to use instead of an in-memory database')
+    parser.add_argument('--response-cache', choices=('null', 'memory'), default='null',
+                        help='response cache backend (default: null, so every request reaches the views)')
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    parser.add_argument('--baseline', help='JSON report of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 growth over the baseline')
+    args = parser.parse_args()
+
+    report = run(args)
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(report, json.load(f), args.tolerance)
+        for regression in found:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
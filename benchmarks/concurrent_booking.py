@@ -0,0 +1,124 @@
+# benchmarks/concurrent_booking.py
+#
+# Load test for the atomic booking path: fires thousands of concurrent
+# POST /api/reservations at a single slot from several processes and threads
+# (like multiple Gunicorn workers sharing one SQLite file) and checks that the
+# slot is never overbooked and every counter matches the reservations table.
+#
+#   python -m benchmarks.concurrent_booking --requests 2000 --processes 4 --threads 8
+
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import func
+from app import create_app, db
+from app.models import User, Restaurant, Reservation, SlotOccupancy
+from config import TestingConfig
+
+SLOT_DATE = '2030-06-01'
+SLOT_TIME = '19:00'
+
+
+def make_config(path):
+    class BookingConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + path
+        BOOKING_MAX_RETRIES = 50
+        BOOKING_RETRY_BACKOFF = 0.01
+    return BookingConfig
+
+
+def setup(path, capacity):
+    app = create_app(make_config(path))
+    with app.app_context():
+        db.create_all()
+        manager = User(email='manager@example.com', password_hash='x')
+        db.session.add(Restaurant(
+            name='Load Test Bistro', address='Test Street 1', phone_number='0123456789',
+            description='Single slot under load.', manager=manager, seat_capacity=capacity
+        ))
+        db.session.commit()
+
+
+def worker(path, requests, threads, seed, results):
+    app = create_app(make_config(path))
+    rng = random.Random(seed)
+    payloads = [{
+        'restaurant_id': 1,
+        'name': f'Guest {seed}-{i}',
+        'date': SLOT_DATE,
+        'time': SLOT_TIME,
+        'number_of_people': rng.randint(1, 4),
+        'timestamp': '2030-05-01T12:00:00Z',
+        'user_id': f'user_{rng.randint(1, 50)}',  # Shared ids also race on FrontendUser creation
+    } for i in range(requests)]
+
+    def post(payload):
+        headers = {'Idempotency-Key': payload['name']}  # Every booking is a distinct client request
+        response = app.test_client().post('/api/reservations', json=payload, headers=headers)
+        return response.status_code, payload['number_of_people']
+
+    with ThreadPoolExecutor(threads) as pool:
+        outcomes = list(pool.map(post, payloads))
+    results.put(outcomes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000, help='total bookings to fire')
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8, help='threads per process')
+    parser.add_argument('--capacity', type=int, default=120, help='seats in the slot')
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'booking.db')
+    setup(path, args.capacity)
+
+    results = multiprocessing.Queue()
+    per_process = args.requests // args.processes
+    processes = [
+        multiprocessing.Process(target=worker, args=(path, per_process, args.threads, seed, results))
+        for seed in range(args.processes)
+    ]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    outcomes = [outcome for _ in processes for outcome in results.get()]
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+
+    statuses = Counter(status for status, _ in outcomes)
+    booked_covers = sum(people for status, people in outcomes if status == 201)
+
+    app = create_app(make_config(path))
+    with app.app_context():
+        rows, covers = db.session.query(func.count(Reservation.id), func.coalesce(func.sum(Reservation.person_count), 0)).one()
+        slot_covers = dict(db.session.query(SlotOccupancy.slot_start, SlotOccupancy.covers).all())
+
+    print(f'{len(outcomes)} requests in {elapsed:.2f}s ({len(outcomes) / elapsed:.0f} req/s), statuses: {dict(statuses)}')
+    print(f'reservations: {rows} rows, {covers} covers; capacity {args.capacity}; slot counters: {sorted(set(slot_covers.values()))}')
+
+    errors = []
+    if statuses[201] != rows:
+        errors.append(f'{statuses[201]} bookings acknowledged but {rows} rows stored')
+    if booked_covers != covers:
+        errors.append(f'{booked_covers} covers acknowledged but {covers} stored')
+    if covers > args.capacity:
+        errors.append(f'slot overbooked: {covers} > {args.capacity}')
+    if any(value != covers for value in slot_covers.values()):
+        errors.append(f'slot counters {slot_covers} do not match {covers} booked covers')
+    if set(statuses) - {201, 409}:
+        errors.append(f'unexpected statuses: {dict(statuses)}')
+    for error in errors:
+        print('FAIL:', error)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,112 @@
+# benchmarks/json_compression.py
+#
+# Before/after numbers for the JSON provider and response compression on the
+# largest API payloads: a 500-restaurant page of GET /api/restaurants, a frontend
+# user's reservation list and a restaurant with all its reservations. For each
+# payload it times JSON encoding and compression alone, then whole requests per
+# provider and Accept-Encoding, and prints the body sizes.
+#
+#   python -m benchmarks.json_compression --reservations 100000
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from sqlalchemy import func, select
+from app import create_app, db
+from app.compression import ENCODERS
+from app.models import Reservation, FrontendUser
+from app.serialization import orjson
+from config import TestingConfig
+from seed import generate
+
+
+def make_config(path, provider, algorithms):
+    class PayloadConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + path
+        JSON_PROVIDER = provider
+        COMPRESSION_ALGORITHMS = algorithms
+        RESPONSE_CACHE_BACKEND = 'null'  # Every request encodes its payload
+    return PayloadConfig
+
+
+def largest_payloads():
+    """URLs of the biggest payloads: the restaurant and the frontend user with the most reservations."""
+    restaurant_id = db.session.execute(
+        select(Reservation.restaurant_id).group_by(Reservation.restaurant_id).order_by(func.count().desc()).limit(1)
+    ).scalar()
+    user_id = db.session.execute(
+        select(FrontendUser.user_id).join(Reservation, Reservation.frontend_user_id == FrontendUser.id)
+        .group_by(FrontendUser.id).order_by(func.count().desc()).limit(1)
+    ).scalar()
+    return {
+        'GET /api/restaurants?limit=500': '/api/restaurants?limit=500',
+        'GET /api/users/<id>/reservations': f'/api/users/{user_id}/reservations',
+        'GET /api/restaurants/<id>': f'/api/restaurants/{restaurant_id}',
+    }
+
+
+def best_ms(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare JSON providers and response compression on large payloads.')
+    parser.add_argument('--restaurants', type=int, default=500)
+    parser.add_argument('--users', type=int, default=50, help='frontend users; fewer users means longer reservation lists')
+    parser.add_argument('--reservations', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20, help='runs per measurement; the fastest is reported')
+    args = parser.parse_args()
+
+    variants = [('stdlib', 'identity', ()), ('orjson', 'identity', ())]
+    variants += [('orjson', encoding, (encoding,)) for encoding in ('gzip', 'br') if encoding in ENCODERS]
+
+    # Every variant serves the same database file, so all of them serialize the same rows
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'payloads.db')
+    loader = create_app(make_config(path, 'stdlib', ()))
+    with loader.app_context():
+        db.create_all()
+        generate(args.restaurants, 20, args.users, args.reservations)
+        urls = largest_payloads()
+        db.session.remove()
+        db.engine.dispose()
+    apps = {(provider, encoding): create_app(make_config(path, provider, algorithms))
+            for provider, encoding, algorithms in variants}
+    first = apps[('stdlib', 'identity')]
+
+    print(f'orjson: {"installed" if orjson else "not installed"}; encodings: {", ".join(ENCODERS)}')
+    for label, url in urls.items():
+        payload = first.test_client().get(url).get_json()
+        print(f'\n{label}')
+        for provider in ('stdlib', 'orjson'):
+            app = apps[(provider, 'identity')]
+            with app.app_context():
+                size = len(app.json.response(payload).get_data())
+                encode_ms = best_ms(lambda: app.json.response(payload), args.repeat)
+            print(f'  encode {provider:8}            {encode_ms:8.2f} ms  {size:>9} bytes')
+        with first.app_context():
+            data = apps[('orjson', 'identity')].json.response(payload).get_data()
+        for encoding, encode in ENCODERS.items():
+            compressed = encode(data, first.config)
+            compress_ms = best_ms(lambda: encode(data, first.config), args.repeat)
+            print(f'  compress {encoding:7}            {compress_ms:8.2f} ms  {len(compressed):>9} bytes')
+        for (provider, encoding), app in apps.items():
+            client = app.test_client()
+            headers = {'Accept-Encoding': encoding}
+            body = client.get(url, headers=headers).get_data()
+            request_ms = best_ms(lambda: client.get(url, headers=headers), args.repeat)
+            print(f'  request {provider:8} {encoding:9} {request_ms:8.2f} ms  {len(body):>9} bytes')
+    shutil.rmtree(directory)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+# benchmarks/query_counts.py
+#
+# Asserts that the JSON API endpoints run a fixed number of SQL queries,
+# whatever the number of restaurants, categories and reservations.
+#
+#   python -m benchmarks.query_counts
+
+import sys
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import create_app, db
+from app.models import User, Restaurant, Category, FrontendUser, Reservation
+from config import TestingConfig
+
+# Maximum number of statements each endpoint may issue
+EXPECTED_MAX_QUERIES = {
+    '/api/restaurants': 2,
+    '/api/restaurants/1': 3,
+    '/api/categories/1/restaurants': 3,
+    '/api/users/user_1/reservations': 2,
+}
+
+
+def populate(size):
+    categories = [Category(name=f'Category {i}') for i in range(5)]
+    frontend_user = FrontendUser(user_id='user_1')
+    db.session.add_all(categories + [frontend_user])
+    for i in range(size):
+        manager = User(email=f'manager{i}@example.com', password_hash='x')
+        restaurant = Restaurant(
+            name=f'Restaurant {i}', address=f'Street {i}', phone_number='0123456789',
+            description='Seeded for query counting.', manager=manager,
+            categories=[categories[0], categories[1 + i % 4]]
+        )
+        db.session.add(restaurant)
+        for j in range(3):
+            db.session.add(Reservation(
+                restaurant=restaurant, name=f'Customer {j}', person_count=2, status='pending',
+                reservation_datetime=datetime.utcnow() + timedelta(days=j), frontend_user=frontend_user
+            ))
+    db.session.commit()
+
+
+def count_queries(app, url):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    client = app.test_client()
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.get(url)
+        assert response.status_code == 200, f'{url} returned {response.status_code}'
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return len(statements)
+
+
+def main():
+    failures = []
+    counts = {}
+    for size in (5, 50):
+        app = create_app(TestingConfig)
+        with app.app_context():
+            db.create_all()
+            populate(size)
+        for url in EXPECTED_MAX_QUERIES:
+            counts.setdefault(url, []).append(count_queries(app, url))
+
+    for url, (small, large) in counts.items():
+        status = 'ok'
+        if small != large or large > EXPECTED_MAX_QUERIES[url]:
+            status = 'FAIL'
+            failures.append(url)
+        print(f'{url:40} {small:3} -> {large:3} queries  {status}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
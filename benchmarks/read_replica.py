@@ -0,0 +1,102 @@
+# benchmarks/read_replica.py
+#
+# Checks read-replica routing with two SQLite files: the primary is copied to a
+# "replica" that then stops receiving changes, so any row read from the replica
+# is visibly stale. GET requests must read the replica, writes must land on the
+# primary, and a client that just wrote must read the primary until its sticky
+# window (REPLICA_STICKY_SECONDS) runs out. The response cache is on: a stale
+# replica read made right after a write must never be cached and then served to
+# that client, while cached responses are served to every GET. Replica reads are
+# cached again once the last write is older than the sticky window. The nearby
+# index must be built from the primary.
+#
+#   python -m benchmarks.read_replica
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from app import create_app, db
+from app.models import Restaurant
+from config import TestingConfig, replica_binds
+
+
+def make_config(primary, replica):
+    class ReplicaConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + primary
+        SQLALCHEMY_BINDS = replica_binds('sqlite:///' + replica)
+        RESPONSE_CACHE_BACKEND = 'memory'
+        REPLICA_STICKY_SECONDS = 1
+    return ReplicaConfig
+
+
+def main():
+    from benchmarks import query_counts
+
+    directory = tempfile.mkdtemp()
+    primary, replica = os.path.join(directory, 'primary.db'), os.path.join(directory, 'replica.db')
+    app = create_app(make_config(primary, replica))
+    with app.app_context():
+        db.create_all()
+        query_counts.populate(1)
+        restaurant_id = Restaurant.query.first().id
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()  # Closing the last connection checkpoints the WAL into primary.db
+    shutil.copyfile(primary, replica)
+
+    # From here on the replica lags behind: only the primary sees the rename and the move
+    with app.app_context():
+        restaurant = db.session.get(Restaurant, restaurant_id)
+        restaurant.name = 'Renamed on primary'
+        restaurant.latitude, restaurant.longitude = 10.0, 10.0
+        db.session.commit()
+
+    client = app.test_client()
+    checks = []
+
+    name = client.get(f'/api/restaurants/{restaurant_id}').get_json()['name']
+    checks.append(('GET reads the replica', name != 'Renamed on primary'))
+    listed = [client.get('/api/restaurants').headers['X-Cache'] for _ in range(2)]
+    checks.append(('GET from the replica right after a write is not cached', listed == ['MISS', 'MISS']))
+    nearby = client.get('/api/restaurants/nearby?lat=10&lon=10&radius=1').get_json()['restaurants']
+    checks.append(('Nearby index is built from the primary', [item['id'] for item in nearby] == [restaurant_id]))
+
+    created = client.post('/api/reservations', json={
+        'restaurant_id': restaurant_id, 'name': 'Replica Check', 'date': '2030-01-01', 'time': '19:00',
+        'number_of_people': 2, 'timestamp': '2029-12-01T12:00:00Z', 'user_id': 'replica_check',
+    })
+    with app.app_context():
+        on_primary = db.session.execute(db.text(
+            "SELECT count(*) FROM reservations WHERE name = 'Replica Check'"
+        )).scalar()
+    checks.append(('POST writes to the primary', created.status_code == 201 and on_primary == 1))
+
+    name = client.get(f'/api/restaurants/{restaurant_id}').get_json()['name']
+    found = client.get('/api/users/replica_check/reservations').status_code
+    checks.append(('GET after a write reads the primary', name == 'Renamed on primary' and found == 200))
+    names = [item['name'] for item in client.get('/api/restaurants').get_json()['restaurants']]
+    checks.append(('GET after a write gets no cached replica read', names == ['Renamed on primary']))
+
+    time.sleep(1.1)
+    client.delete_cookie('read_primary_until')  # The browser drops it once max_age passed
+    found = client.get('/api/users/replica_check/reservations').status_code
+    checks.append(('GET reads the replica again after the sticky window', found == 404))
+    listed = client.get('/api/restaurants')
+    names = [item['name'] for item in listed.get_json()['restaurants']]
+    checks.append(('GET from the replica is served the cached primary read',
+                   listed.headers['X-Cache'] == 'HIT' and names == ['Renamed on primary']))
+    listed = [client.get('/api/categories').headers['X-Cache'] for _ in range(2)]
+    checks.append(('GET from the replica is cached after the sticky window', listed == ['MISS', 'HIT']))
+
+    failed = 0
+    for description, ok in checks:
+        print(f'{description:55} {"ok" if ok else "FAIL"}')
+        failed += not ok
+    shutil.rmtree(directory)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
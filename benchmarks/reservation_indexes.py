@@ -0,0 +1,119 @@
+# benchmarks/reservation_indexes.py
+#
+# Seeds a SQLite file with ~1M reservations through seed.generate(), with the
+# reservation indexes dropped, and reports p50/p99 latency of the
+# reservation-heavy endpoints before and after creating the composite indexes
+# declared on Reservation (see migrations/versions/c5a8e2f91d36_*).
+#
+#   python -m benchmarks.reservation_indexes --reservations 1000000 --samples 50
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from sqlalchemy import text
+from app import create_app, db
+from app.models import Reservation
+from config import TestingConfig
+from seed import generate
+
+INDEX_NAMES = [index.name for index in Reservation.__table__.indexes if index.name.startswith('ix_reservations_')]
+
+
+def make_config(path):
+    class IndexBenchmarkConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + path
+    return IndexBenchmarkConfig
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def measure(app, args):
+    rng = random.Random(args.seed + 1)
+    anonymous = app.test_client()
+    managers = []
+    for restaurant_id in rng.sample(range(1, args.restaurants + 1), min(10, args.restaurants)):
+        client = app.test_client()
+        client.post('/auth/login', data={'email': f'manager{restaurant_id}@example.com', 'password': 'password123'})
+        managers.append(client)
+
+    endpoints = {
+        'manage_reservations': lambda: anonymous.get(f'/restaurants/{rng.randint(1, args.restaurants)}/reservations'),
+        'dashboard': lambda: rng.choice(managers).get('/dashboard?time_frame=week'),
+        'my_reservations': lambda: rng.choice(managers).get('/my_reservations'),
+        'get_user_reservations': lambda: anonymous.get(f'/api/users/user_{rng.randint(1, args.users):06d}/reservations'),
+    }
+    report = {}
+    for name, call in endpoints.items():
+        timings = []
+        for _ in range(args.samples):
+            started = time.perf_counter()
+            response = call()
+            timings.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200, f'{name} returned {response.status_code}'
+        report[name] = {
+            'p50_ms': round(statistics.median(timings), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--reservations', type=int, default=1000000)
+    parser.add_argument('--restaurants', type=int, default=1000)
+    parser.add_argument('--categories', type=int, default=20)
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--samples', type=int, default=50, help='requests per endpoint and phase')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', action='store_true', help='print the report as JSON only')
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'indexes.db')
+    app = create_app(make_config(path))
+    with app.app_context():
+        db.create_all()
+        with db.engine.begin() as conn:
+            for name in INDEX_NAMES:
+                conn.execute(text(f'DROP INDEX {name}'))
+
+        started = time.perf_counter()
+        generate(args.restaurants, args.categories, args.users, args.reservations, args.seed)
+        seeded_in = time.perf_counter() - started
+        if not args.json:
+            print(f'Seeded {args.reservations} reservations in {seeded_in:.1f}s')
+
+        before = measure(app, args)
+        started = time.perf_counter()
+        for index in Reservation.__table__.indexes:
+            if index.name in INDEX_NAMES:
+                index.create(db.engine)
+        with db.engine.begin() as conn:
+            conn.execute(text('ANALYZE'))
+        indexed_in = time.perf_counter() - started
+        after = measure(app, args)
+
+    report = {
+        name: {'before': before[name], 'after': after[name]} for name in before
+    }
+    if args.json:
+        print(json.dumps({'reservations': args.reservations, 'index_build_s': round(indexed_in, 2), 'endpoints': report}))
+        return 0
+
+    print(f'Built {", ".join(INDEX_NAMES)} in {indexed_in:.1f}s\n')
+    print(f'{"endpoint":24} {"p50 before":>11} {"p50 after":>10} {"p99 before":>11} {"p99 after":>10}')
+    for name, phases in report.items():
+        print(f'{name:24} {phases["before"]["p50_ms"]:>9.2f}ms {phases["after"]["p50_ms"]:>8.2f}ms '
+              f'{phases["before"]["p99_ms"]:>9.2f}ms {phases["after"]["p99_ms"]:>8.2f}ms')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
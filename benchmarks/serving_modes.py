@@ -0,0 +1,231 @@
+# benchmarks/serving_modes.py
+#
+# Compares throughput and latency of the read-heavy /api/* endpoints under each
+# serving mode of serve.py. Every mode serves the same SQLite file in its own
+# process while a set of slow clients holds connections open with unfinished
+# requests and a manager keeps event streams (/api/restaurants/<id>/events)
+# open. A mode that cannot serve requests next to an open stream shows it as
+# timeouts within the time limit. Modes whose packages are not installed are
+# reported as skipped.
+#
+#   python -m benchmarks.serving_modes --concurrency 64 --requests 5000 --slow-clients 200 --streams 20
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from config import TestingConfig
+from serve import MODES, missing_requirements
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STREAM_MANAGER = ('manager0@example.com', 'serving-benchmark')  # Manages restaurant 1
+
+
+class BenchmarkConfig(TestingConfig):
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.environ.get('SERVING_BENCHMARK_DB', '')
+    RESPONSE_CACHE_BACKEND = 'null'  # Measure the views, not the response cache
+
+
+def populate(path, restaurants):
+    from app import create_app, db
+    from app.models import User
+    from benchmarks import query_counts
+
+    class PopulateConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + path
+
+    app = create_app(PopulateConfig)
+    with app.app_context():
+        db.create_all()
+        query_counts.populate(restaurants)
+        email, password = STREAM_MANAGER
+        User.query.filter_by(email=email).one().set_password(password)
+        db.session.commit()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, port, path):
+    env = dict(os.environ, SERVING_BENCHMARK_DB=path)
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'serve.py'), '--mode', mode, '--port', str(port),
+         '--config', 'benchmarks.serving_modes:BenchmarkConfig'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            connection.request('GET', '/api/categories')
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'{mode} server did not start')
+
+
+def open_slow_clients(port, count):
+    """Connections that send half a request and then go quiet, like clients on a bad network."""
+    sockets = []
+    for _ in range(count):
+        sock = socket.create_connection(('127.0.0.1', port))
+        sock.sendall(b'GET /api/categories HTTP/1.1\r\nHost: localhost\r\n')
+        sockets.append(sock)
+    return sockets
+
+
+def log_in(port):
+    """Session cookie of the manager whose restaurant's events are streamed."""
+    email, password = STREAM_MANAGER
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    connection.request('POST', '/auth/login', body=f'email={email}&password={password}',
+                       headers={'Content-Type': 'application/x-www-form-urlencoded'})
+    response = connection.getresponse()
+    response.read()
+    return response.getheader('Set-Cookie').split(';', 1)[0]
+
+
+def open_streams(port, count, timeout):
+    """Event streams held open by a logged-in manager; stops at the first that does not start within timeout."""
+    cookie = log_in(port) if count else None
+    sockets = []
+    for _ in range(count):
+        sock = socket.create_connection(('127.0.0.1', port))
+        sock.settimeout(timeout)
+        sock.sendall(f'GET /api/restaurants/1/events HTTP/1.1\r\nHost: localhost\r\nCookie: {cookie}\r\n\r\n'.encode())
+        received = b''
+        try:
+            while b'retry:' not in received:
+                chunk = sock.recv(4096)
+                if not chunk:
+                    break
+                received += chunk
+        except socket.timeout:
+            pass
+        sockets.append(sock)
+        if b'retry:' not in received:
+            return sockets, len(sockets) - 1
+    return sockets, len(sockets)
+
+
+def measure(port, args):
+    paths = ['/api/restaurants', '/api/categories', '/api/categories/1/restaurants'] + \
+            [f'/api/restaurants/{i}' for i in range(1, args.restaurants + 1)]
+    remaining = [args.requests]
+    lock = threading.Lock()
+    timings = []
+    errors = [0]
+
+    def worker(seed):
+        rng = random.Random(seed)
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=args.timeout)
+        while time.perf_counter() < deadline:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            started = time.perf_counter()
+            try:
+                connection.request('GET', rng.choice(paths))
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=args.timeout)
+                ok = False
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                timings.append(elapsed)
+                errors[0] += not ok
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(args.concurrency)]
+    started = time.perf_counter()
+    deadline = started + args.time_limit
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - started
+
+    ordered = sorted(timings)
+    return {
+        'requests': len(timings),
+        'requests_per_s': round(len(timings) / duration, 1),
+        'p50_ms': round(statistics.median(ordered), 2),
+        'p99_ms': round(ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))], 2),
+        'errors': errors[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare serving modes on the read API.')
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--restaurants', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=64, help='concurrent client connections')
+    parser.add_argument('--requests', type=int, default=5000, help='requests per mode')
+    parser.add_argument('--slow-clients', type=int, default=200, help='idle half-sent requests held open')
+    parser.add_argument('--streams', type=int, default=20, help='event streams held open')
+    parser.add_argument('--timeout', type=float, default=10, help='seconds before a request or stream counts as failed')
+    parser.add_argument('--time-limit', type=float, default=60, help='seconds per mode before the remaining requests are dropped')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON only')
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'serving.db')
+    populate(path, args.restaurants)
+
+    report = {}
+    for mode in args.modes.split(','):
+        missing = missing_requirements(mode)
+        if missing:
+            report[mode] = {'skipped': f'pip install {" ".join(missing)}'}
+            continue
+        port = free_port()
+        server = start_server(mode, port, path)
+        try:
+            slow_clients = open_slow_clients(port, args.slow_clients)
+            streams, started = open_streams(port, args.streams, args.timeout)
+            report[mode] = measure(port, args)
+            report[mode]['streams'] = started
+            for sock in slow_clients + streams:
+                sock.close()
+        finally:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:  # Still waiting on requests it never got to
+                server.kill()
+                server.wait()
+
+    if args.json:
+        print(json.dumps({'concurrency': args.concurrency, 'slow_clients': args.slow_clients,
+                          'streams': args.streams, 'modes': report}))
+        return 0
+
+    print(f'{args.requests} requests per mode, {args.concurrency} concurrent clients, {args.slow_clients} slow clients, '
+          f'{args.streams} event streams\n')
+    print(f'{"mode":8} {"streams":>8} {"requests":>9} {"req/s":>9} {"p50":>9} {"p99":>9} {"errors":>7}')
+    for mode, result in report.items():
+        if 'skipped' in result:
+            print(f'{mode:8} skipped ({result["skipped"]})')
+        else:
+            print(f'{mode:8} {result["streams"]:>8} {result["requests"]:>9} {result["requests_per_s"]:>9.1f} '
+                  f'{result["p50_ms"]:>7.2f}ms {result["p99_ms"]:>7.2f}ms {result["errors"]:>7}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,135 @@
+# benchmarks/sqlite_pragmas.py
+#
+# Concurrent read/write throughput on one SQLite file, with SQLite's defaults
+# (rollback journal, synchronous=FULL) and with Config.SQLITE_PRAGMAS (WAL,
+# synchronous=NORMAL, busy_timeout, mmap). Reader processes fetch restaurant
+# details while writer processes book reservations, like several Gunicorn
+# workers sharing the database.
+#
+#   python -m benchmarks.sqlite_pragmas --readers 4 --writers 2 --seconds 10
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from app import create_app, db
+from config import Config, TestingConfig
+
+PROFILES = {
+    'default': {},
+    'tuned': Config.SQLITE_PRAGMAS,
+}
+
+
+def make_config(path, pragmas):
+    class PragmaBenchmarkConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + path
+        SQLITE_PRAGMAS = pragmas
+        RESPONSE_CACHE_BACKEND = 'null'  # Every read goes to the database
+        BOOKING_MAX_RETRIES = 20
+    return PragmaBenchmarkConfig
+
+
+def setup(path, pragmas, restaurants):
+    from benchmarks import query_counts
+    app = create_app(make_config(path, pragmas))
+    with app.app_context():
+        db.create_all()
+        query_counts.populate(restaurants)
+
+
+def reader(path, pragmas, restaurants, deadline, seed, results):
+    client = create_app(make_config(path, pragmas)).test_client()
+    rng = random.Random(seed)
+    timings, errors, started_at = [], 0, time.time()
+    while time.time() < deadline:
+        started = time.perf_counter()
+        response = client.get(f'/api/restaurants/{rng.randint(1, restaurants)}')
+        timings.append((time.perf_counter() - started) * 1000)
+        errors += response.status_code != 200
+    results.put(('read', timings, errors, time.time() - started_at))
+
+
+def writer(path, pragmas, restaurants, deadline, seed, results):
+    client = create_app(make_config(path, pragmas)).test_client()
+    rng = random.Random(seed)
+    timings, errors, i, started_at = [], 0, 0, time.time()
+    while time.time() < deadline:
+        i += 1
+        day = date.today() + timedelta(days=rng.randint(1, 60))
+        payload = {
+            'restaurant_id': rng.randint(1, restaurants), 'name': f'Guest {seed}-{i}',
+            'date': day.isoformat(), 'time': f'{rng.randint(12, 20)}:{rng.choice(("00", "30"))}',
+            'number_of_people': rng.randint(1, 4), 'timestamp': '2030-01-01T12:00:00Z', 'user_id': f'user_{seed}_{i}',
+        }
+        started = time.perf_counter()
+        response = client.post('/api/reservations', json=payload, headers={'Idempotency-Key': f'{seed}-{i}'})
+        timings.append((time.perf_counter() - started) * 1000)
+        errors += response.status_code not in (201, 409)
+    results.put(('write', timings, errors, time.time() - started_at))
+
+
+def run_profile(name, args):
+    path = os.path.join(tempfile.mkdtemp(), f'{name}.db')
+    pragmas = PROFILES[name]
+    setup(path, pragmas, args.restaurants)
+
+    results = multiprocessing.Queue()
+    deadline = time.time() + args.seconds
+    processes = [
+        multiprocessing.Process(target=reader, args=(path, pragmas, args.restaurants, deadline, seed, results))
+        for seed in range(args.readers)
+    ] + [
+        multiprocessing.Process(target=writer, args=(path, pragmas, args.restaurants, deadline, 1000 + seed, results))
+        for seed in range(args.writers)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    report = {}
+    for kind in ('read', 'write'):
+        outcomes_of_kind = [outcome for outcome in outcomes if outcome[0] == kind]
+        timings = sorted(t for _, samples, _, _ in outcomes_of_kind for t in samples)
+        report[kind] = {
+            'per_s': round(sum(len(samples) / elapsed for _, samples, _, elapsed in outcomes_of_kind), 1),
+            'p50_ms': round(statistics.median(timings), 2) if timings else None,
+            'p99_ms': round(timings[int(0.99 * (len(timings) - 1))], 2) if timings else None,
+            'errors': sum(errors for _, _, errors, _ in outcomes_of_kind),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent read/write throughput with and without SQLite PRAGMAs.')
+    parser.add_argument('--readers', type=int, default=4, help='reader processes')
+    parser.add_argument('--writers', type=int, default=2, help='writer processes')
+    parser.add_argument('--seconds', type=int, default=10)
+    parser.add_argument('--restaurants', type=int, default=100)
+    parser.add_argument('--json', action='store_true', help='print the report as JSON only')
+    args = parser.parse_args()
+
+    report = {name: run_profile(name, args) for name in PROFILES}
+    if args.json:
+        print(json.dumps(report))
+        return 0
+
+    print(f'{args.readers} readers, {args.writers} writers, {args.seconds}s per profile\n')
+    print(f'{"profile":8} {"reads/s":>8} {"read p99":>10} {"writes/s":>9} {"write p99":>10} {"errors":>7}')
+    for name, result in report.items():
+        read, write = result['read'], result['write']
+        print(f'{name:8} {read["per_s"]:>8.1f} {read["p99_ms"]:>8.2f}ms {write["per_s"]:>9.1f} '
+              f'{write["p99_ms"]:>8.2f}ms {read["errors"] + write["errors"]:>7}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
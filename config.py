@@ -4,9 +4,138 @@ import os
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+
+def engine_options(uri):
+    """SQLALCHEMY_ENGINE_OPTIONS for a database URI. SQLite keeps SQLAlchemy's default pool."""
+    if uri.startswith('sqlite'):
+        return {}
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),  # Connections kept open per process
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),  # Extra connections under bursts
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),  # Seconds to wait for a free connection
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),  # Seconds before a connection is replaced
+        'pool_pre_ping': True,  # Detect connections dropped by the server or a proxy
+    }
+
+
+def replica_binds(uri):
+    """SQLALCHEMY_BINDS with a read-only 'replica' bind when a replica URI is configured."""
+    if not uri:
+        return {}
+    return {'replica': {'url': uri, **engine_options(uri)}}
+
+
 class Config:
     #SECRET_KEY = os.environ.get('SECRET_KEY', 'your_secret_key')
     SECRET_KEY = 'your_secret_key' # NOT SECURE FOR PRODUCTION!!!!
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(basedir, 'app.db')
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///' + os.path.join(basedir, 'app.db'))
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    SQLALCHEMY_BINDS = replica_binds(os.environ.get('DATABASE_REPLICA_URL'))  # GET requests read from the replica
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))  # Reads stay on the primary this long after a write
+    SQLALCHEMY_TRACK_MODIFICATIONS = True  # Emits models_committed, used to keep in-process indexes in sync
     DEBUG = True  # Enable debug mode
+
+    # Applied to every new SQLite connection: WAL lets readers run alongside a writer,
+    # synchronous=NORMAL is safe with WAL, and writers wait for the lock instead of failing
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),  # Milliseconds
+        'mmap_size': 256 * 1024 * 1024,  # Bytes of the database file read through mmap
+        'cache_size': -64 * 1024,  # Page cache in KiB (negative) per connection
+    }
+
+    # API pagination
+    API_PAGE_SIZE = 50  # Default page size for paginated list endpoints
+    API_MAX_PAGE_SIZE = 500  # Upper bound for the ?limit= query parameter
+    API_STREAM_BATCH_SIZE = 500  # Rows fetched per round trip when streaming exports
+
+    # Response cache for read endpoints
+    RESPONSE_CACHE_BACKEND = 'memory'  # 'memory', 'null' (disabled) or 'module:Class'
+    RESPONSE_CACHE_MAX_ENTRIES = 2048  # Least recently used responses are evicted beyond this
+    RESPONSE_CACHE_TTL = 300  # Seconds; bounds staleness for writes made by other processes
+
+    # JSON encoding and response compression
+    JSON_PROVIDER = 'orjson'  # 'orjson' (the json module when orjson is not installed), 'stdlib' or 'module:Class'
+    COMPRESSION_ALGORITHMS = ('br', 'gzip')  # Preference among the encodings a client accepts; 'br' needs brotli
+    COMPRESSION_MIN_SIZE = 1024  # Bytes; smaller bodies are sent uncompressed
+    COMPRESSION_MIMETYPES = ('application/json', 'text/html', 'text/plain', 'text/csv', 'text/css', 'application/javascript')
+    GZIP_LEVEL = 5  # 1 (fastest) to 9 (smallest); above 5 costs ~50% more CPU for ~7% smaller JSON
+    BROTLI_QUALITY = 4  # 0 to 11; higher qualities cost far more CPU for little gain on dynamic responses
+
+    # Nearby restaurants search
+    NEARBY_INDEX_CELL_SIZE = 0.01  # Grid cell size in degrees (~1 km)
+    NEARBY_INDEX_MAX_AGE = 300  # Seconds before the spatial index is rebuilt from the database
+    NEARBY_DEFAULT_RADIUS_KM = 5
+    NEARBY_MAX_RADIUS_KM = 50
+    NEARBY_DEFAULT_LIMIT = 10
+
+    # Category filters and facet counts
+    FACET_INDEX_MAX_AGE = 300  # Seconds before the category bitmaps are rebuilt from the database
+
+    # Metrics
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # When set, GET /metrics requires "Authorization: Bearer <token>"
+
+    # On-demand request profiling
+    PROFILER_TOKEN = os.environ.get('PROFILER_TOKEN')  # Requests sending it in X-Profile or ?_profile= are profiled; unset disables
+    PROFILER_OUTPUT_DIR = os.environ.get('PROFILER_OUTPUT_DIR', os.path.join(basedir, 'profiles'))
+    PROFILER_SAMPLE_INTERVAL = 0.001  # Seconds between stack samples of a profiled request
+
+    # Geocoding
+    GEOCODER_BACKEND = os.environ.get('GEOCODER_BACKEND', 'nominatim')  # 'nominatim', 'offline' or 'module:Class'
+    GEOCODER_USER_AGENT = 'restaurant_reservation_app'
+    GEOCODER_TIMEOUT = 5  # Seconds per Nominatim request
+    GEOCODER_MAX_RETRIES = 1  # Immediate retries per attempt; the background queue retries with backoff
+    GEOCODER_RETRY_DELAY = 1  # Seconds between immediate retries
+    GEOCODE_CACHE_TTL = 90 * 24 * 3600  # Seconds a found address stays cached
+    GEOCODE_NEGATIVE_TTL = 24 * 3600  # Seconds an address that was not found stays cached
+    OFFLINE_GEOCODER_BBOX = (46.2, 10.4, 47.1, 12.5)  # south, west, north, east (South Tyrol)
+
+    # Background geocoding queue
+    GEOCODE_WORKERS = 2  # Threads per process; 0 geocodes inline after commit
+    GEOCODE_MAX_ATTEMPTS = 5  # Attempts before a restaurant is marked 'failed'
+    GEOCODE_RETRY_BACKOFF = 30  # Seconds before the first retry, doubled on every further attempt
+    GEOCODE_CLAIM_LEASE = 300  # Seconds a claimed job is hidden from other workers
+    GEOCODE_SWEEP_INTERVAL = 15  # Seconds between scans for due jobs
+
+    # Availability
+    DEFAULT_OPENING_HOURS = ('11:00', '23:00')  # Used for restaurants without opening_hours rows
+    MAX_PARTY_SIZE = 50
+
+    # Booking
+    BOOKING_MAX_RETRIES = 5  # Attempts when a booking loses a race or hits a lock timeout
+    BOOKING_RETRY_BACKOFF = 0.05  # Seconds; jittered and doubled on every retry
+    BULK_MAX_ROWS = 10000  # Reservations per POST /api/reservations/bulk request
+    IDEMPOTENCY_KEY_TTL = 24 * 3600  # Seconds a retried POST /api/reservations returns the original booking
+    EVENT_STREAM_HEARTBEAT = 15  # Seconds between keepalive comments on /api/restaurants/<id>/events
+    EVENT_STREAM_MAX_QUEUED = 100  # Undelivered events per subscriber before it is dropped
+    STATS_DEFAULT_DAYS = 30  # Window of /api/restaurants/<id>/stats and /api/stats/categories without ?from=
+    STATS_CACHE_MAX_AGE = 60  # Seconds clients may reuse a stats response before revalidating its ETag
+
+class ProductionConfig(Config):
+    SECRET_KEY = os.environ.get('SECRET_KEY')  # Required
+    DEBUG = False
+
+
+class TestingConfig(Config):
+    # In-memory database for benchmarks and offline checks
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    SQLALCHEMY_BINDS = {}
+    TESTING = True
+    DEBUG = False
+    WTF_CSRF_ENABLED = False
+    GEOCODER_BACKEND = 'offline'
+    GEOCODE_WORKERS = 0
+
+
+# Selected with the APP_CONFIG environment variable when create_app() gets no config class
+CONFIG_PROFILES = {
+    'development': Config,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+}
+
+
+def config_from_env():
+    return CONFIG_PROFILES[os.environ.get('APP_CONFIG', 'development')]
@@ -0,0 +1,38 @@
+"""Add background geocoding state to Restaurant
+
+Revision ID: 8d2e4b6a1c07
+Revises: 3f1c9a2e7b4d
+Create Date: 2026-10-18 11:03:27.551902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2e4b6a1c07'
+down_revision = '3f1c9a2e7b4d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('restaurants', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('geocode_status', sa.String(length=20), nullable=False, server_default='done'))
+        batch_op.add_column(sa.Column('geocode_attempts', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('geocode_next_attempt_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_restaurants_geocode_status'), ['geocode_status'], unique=False)
+
+    # Existing restaurants without coordinates go back through the queue
+    op.execute(
+        "UPDATE restaurants SET geocode_status = 'pending', geocode_next_attempt_at = CURRENT_TIMESTAMP "
+        "WHERE latitude IS NULL OR longitude IS NULL"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('restaurants', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_restaurants_geocode_status'))
+        batch_op.drop_column('geocode_next_attempt_at')
+        batch_op.drop_column('geocode_attempts')
+        batch_op.drop_column('geocode_status')
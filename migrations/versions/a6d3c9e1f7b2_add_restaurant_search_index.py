@@ -0,0 +1,40 @@
+"""Add restaurant_search FTS5 index
+
+Revision ID: a6d3c9e1f7b2
+Revises: f3b8a61d5c42
+Create Date: 2026-10-18 19:42:11.308514
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d3c9e1f7b2'
+down_revision = 'f3b8a61d5c42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 is SQLite only; other databases fall back to LIKE matching in app/search.py
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute(
+        "CREATE VIRTUAL TABLE restaurant_search USING fts5("
+        "name, description, address, categories, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    op.execute(
+        "INSERT INTO restaurant_search (rowid, name, description, address, categories) "
+        "SELECT restaurants.id, restaurants.name, restaurants.description, restaurants.address, "
+        "coalesce(group_concat(categories.name, ' '), '') "
+        "FROM restaurants "
+        "LEFT JOIN restaurant_categories ON restaurant_categories.restaurant_id = restaurants.id "
+        "LEFT JOIN categories ON categories.id = restaurant_categories.category_id "
+        "GROUP BY restaurants.id"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute('DROP TABLE restaurant_search')
@@ -0,0 +1,104 @@
+"""Add restaurant capacity, opening hours and slot occupancy index
+
+Revision ID: b7e19c35d2a8
+Revises: 8d2e4b6a1c07
+Create Date: 2026-10-18 13:41:09.882310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e19c35d2a8'
+down_revision = '8d2e4b6a1c07'
+branch_labels = None
+depends_on = None
+
+
+BACKFILL_SQLITE = """
+    INSERT INTO slot_occupancy (restaurant_id, slot_start, covers)
+    WITH RECURSIVE occupied(restaurant_id, slot_start, ends_at, slot_minutes, covers) AS (
+        SELECT reservations.restaurant_id,
+               strftime('%Y-%m-%d %H:%M:%f', date(reservations.reservation_datetime), '+' || (
+                   (CAST(strftime('%H', reservations.reservation_datetime) AS INTEGER) * 60
+                    + CAST(strftime('%M', reservations.reservation_datetime) AS INTEGER))
+                   / restaurants.slot_minutes * restaurants.slot_minutes) || ' minutes'),
+               strftime('%Y-%m-%d %H:%M:%f', reservations.reservation_datetime,
+                        '+' || restaurants.dining_minutes || ' minutes'),
+               restaurants.slot_minutes,
+               reservations.person_count
+        FROM reservations JOIN restaurants ON restaurants.id = reservations.restaurant_id
+        WHERE reservations.status IN ('pending', 'accepted')
+        UNION ALL
+        SELECT restaurant_id, strftime('%Y-%m-%d %H:%M:%f', slot_start, '+' || slot_minutes || ' minutes'),
+               ends_at, slot_minutes, covers
+        FROM occupied
+        WHERE strftime('%Y-%m-%d %H:%M:%f', slot_start, '+' || slot_minutes || ' minutes') < ends_at
+    )
+    SELECT restaurant_id, substr(slot_start, 1, 19) || '.000000', sum(covers)
+    FROM occupied
+    GROUP BY restaurant_id, slot_start
+"""
+
+BACKFILL_POSTGRESQL = """
+    INSERT INTO slot_occupancy (restaurant_id, slot_start, covers)
+    SELECT reservations.restaurant_id, slots.slot_start, sum(reservations.person_count)
+    FROM reservations
+    JOIN restaurants ON restaurants.id = reservations.restaurant_id
+    CROSS JOIN LATERAL generate_series(
+        date_trunc('day', reservations.reservation_datetime)
+            + floor(extract(epoch FROM reservations.reservation_datetime
+                            - date_trunc('day', reservations.reservation_datetime)) / 60 / restaurants.slot_minutes)
+              * restaurants.slot_minutes * interval '1 minute',
+        reservations.reservation_datetime + restaurants.dining_minutes * interval '1 minute' - interval '1 microsecond',
+        restaurants.slot_minutes * interval '1 minute'
+    ) AS slots(slot_start)
+    WHERE reservations.status IN ('pending', 'accepted')
+    GROUP BY reservations.restaurant_id, slots.slot_start
+"""
+
+
+def upgrade():
+    with op.batch_alter_table('restaurants', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('seat_capacity', sa.Integer(), nullable=False, server_default='40'))
+        batch_op.add_column(sa.Column('slot_minutes', sa.Integer(), nullable=False, server_default='30'))
+        batch_op.add_column(sa.Column('dining_minutes', sa.Integer(), nullable=False, server_default='90'))
+
+    op.create_table('opening_hours',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('restaurant_id', sa.Integer(), nullable=False),
+    sa.Column('weekday', sa.Integer(), nullable=False),
+    sa.Column('opens_at', sa.Time(), nullable=False),
+    sa.Column('closes_at', sa.Time(), nullable=False),
+    sa.ForeignKeyConstraint(['restaurant_id'], ['restaurants.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('opening_hours', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_opening_hours_restaurant_id'), ['restaurant_id'], unique=False)
+
+    op.create_table('slot_occupancy',
+    sa.Column('restaurant_id', sa.Integer(), nullable=False),
+    sa.Column('slot_start', sa.DateTime(), nullable=False),
+    sa.Column('covers', sa.Integer(), nullable=False),
+    sa.CheckConstraint('covers >= 0', name='ck_slot_occupancy_covers'),
+    sa.ForeignKeyConstraint(['restaurant_id'], ['restaurants.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('restaurant_id', 'slot_start')
+    )
+
+    # Existing pending and accepted reservations take up every slot from the start of
+    # the one they begin in until dining_minutes after they begin
+    bind = op.get_bind()
+    op.execute(BACKFILL_SQLITE if bind.dialect.name == 'sqlite' else BACKFILL_POSTGRESQL)
+
+
+def downgrade():
+    op.drop_table('slot_occupancy')
+    with op.batch_alter_table('opening_hours', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_opening_hours_restaurant_id'))
+
+    op.drop_table('opening_hours')
+    with op.batch_alter_table('restaurants', schema=None) as batch_op:
+        batch_op.drop_column('dining_minutes')
+        batch_op.drop_column('slot_minutes')
+        batch_op.drop_column('seat_capacity')
@@ -0,0 +1,27 @@
+"""Add composite indexes for the hot reservation queries
+
+Revision ID: c5a8e2f91d36
+Revises: 4a9d0f3e6c51
+Create Date: 2026-10-18 16:48:12.097431
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5a8e2f91d36'
+down_revision = '4a9d0f3e6c51'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('reservations', schema=None) as batch_op:
+        batch_op.create_index('ix_reservations_restaurant_datetime', ['restaurant_id', 'reservation_datetime'], unique=False)
+        batch_op.create_index('ix_reservations_frontend_user_datetime', ['frontend_user_id', 'reservation_datetime'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('reservations', schema=None) as batch_op:
+        batch_op.drop_index('ix_reservations_frontend_user_datetime')
+        batch_op.drop_index('ix_reservations_restaurant_datetime')
@@ -0,0 +1,52 @@
+"""Add reservation_hourly_stats rollup table
+
+Revision ID: e1f47b0c9a23
+Revises: c5a8e2f91d36
+Create Date: 2026-10-18 18:05:37.420968
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1f47b0c9a23'
+down_revision = 'c5a8e2f91d36'
+branch_labels = None
+depends_on = None
+
+
+BACKFILL_SQLITE = """
+    INSERT INTO reservation_hourly_stats (restaurant_id, hour_start, status, party_size, reservations)
+    SELECT restaurant_id, strftime('%Y-%m-%d %H:00:00.000000', reservation_datetime), status, person_count, count(*)
+    FROM reservations
+    GROUP BY restaurant_id, strftime('%Y-%m-%d %H:00:00.000000', reservation_datetime), status, person_count
+"""
+
+BACKFILL_POSTGRESQL = """
+    INSERT INTO reservation_hourly_stats (restaurant_id, hour_start, status, party_size, reservations)
+    SELECT restaurant_id, date_trunc('hour', reservation_datetime), status, person_count, count(*)
+    FROM reservations
+    GROUP BY restaurant_id, date_trunc('hour', reservation_datetime), status, person_count
+"""
+
+
+def upgrade():
+    op.create_table('reservation_hourly_stats',
+    sa.Column('restaurant_id', sa.Integer(), nullable=False),
+    sa.Column('hour_start', sa.DateTime(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('party_size', sa.Integer(), nullable=False),
+    sa.Column('reservations', sa.Integer(), nullable=False),
+    sa.CheckConstraint('reservations > 0', name='ck_reservation_hourly_stats_reservations'),
+    sa.ForeignKeyConstraint(['restaurant_id'], ['restaurants.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('restaurant_id', 'hour_start', 'status', 'party_size')
+    )
+
+    # Counts of the existing reservations, all statuses, by hour and party size
+    bind = op.get_bind()
+    op.execute(BACKFILL_SQLITE if bind.dialect.name == 'sqlite' else BACKFILL_POSTGRESQL)
+
+
+def downgrade():
+    op.drop_table('reservation_hourly_stats')
@@ -1,35 +1,40 @@
 # seed.py
 
 from app import create_app, db
-from app.models import FrontendUser, User, Reservation, Restaurant, Category
+from app.models import (
+    FrontendUser, User, Reservation, Restaurant, Category, SlotOccupancy, ReservationHourlyStat, restaurant_categories
+)
 from datetime import datetime, timedelta
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
-import time
+from flask import current_app
+from sqlalchemy import insert
+from app.availability import OCCUPYING_STATUSES, occupied_slots
+from app.geocoding import geocode_address, OfflineGeocoder
+from app.search import rebuild_index
+from werkzeug.security import generate_password_hash
+from collections import defaultdict
+import argparse
 import random
+import time
+
+CATEGORY_NAMES = [
+    'Italian', 'Chinese', 'Mexican', 'Indian', 'Japanese', 'French', 'Thai', 'American', 'Mediterranean',
+    'Vegetarian', 'Seafood', 'Steakhouse', 'Vegan', 'BBQ', 'Bakery', 'Cafe', 'Bar', 'Dessert', 'Fusion', 'Buffet',
+]
+
+# Status mix of generated reservations
+STATUS_WEIGHTS = {'pending': 30, 'accepted': 50, 'declined': 15, 'no_show': 5}
 
-app = create_app()
-
-# initialize geolocator
-geolocator = Nominatim(user_agent="restaurant_reservation_app")
-
-def geocode_address(address, max_retries=3):
-    for attempt in range(max_retries):
-        try:
-            location = geolocator.geocode(address)
-            if location:
-                return (location.latitude, location.longitude)
-            else:
-                return (None, None)
-        except (GeocoderTimedOut, GeocoderServiceError) as e:
-            app.logger.error(f"Geocoding error for address '{address}': {e}")
-            time.sleep(1)  # Wait before retrying
-    return (None, None)
-
-def seed():
+# DateTime values as SQLite stores them; generate() writes them as text, PostgreSQL parses the same format
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+RESERVATION_COLUMNS = ('id', 'reservation_datetime', 'timestamp', 'person_count', 'restaurant_id', 'name', 'status',
+                       'frontend_user_id', 'updated_at', 'version')
+
+
+def seed(app):
     with app.app_context():
-        # Clear existing data
-        db.drop_all()
+        # Clear existing data, keeping the geocode cache so re-seeding stays offline
+        tables = [table for table in db.metadata.sorted_tables if table.name != 'geocode_cache']
+        db.metadata.drop_all(db.engine, tables=tables)
         db.create_all()
 
         # ---------------------------
@@ -54,28 +59,7 @@ def seed():
 
         
         # Create Categories
-        categories = [
-            Category(name='Italian'),
-            Category(name='Chinese'),
-            Category(name='Mexican'),
-            Category(name='Indian'),
-            Category(name='Japanese'),
-            Category(name='French'),
-            Category(name='Thai'),
-            Category(name='American'),
-            Category(name='Mediterranean'),
-            Category(name='Vegetarian'),
-            Category(name='Seafood'),
-            Category(name='Steakhouse'),
-            Category(name='Vegan'),
-            Category(name='BBQ'),
-            Category(name='Bakery'),
-            Category(name='Cafe'),
-            Category(name='Bar'),
-            Category(name='Dessert'),
-            Category(name='Fusion'),
-            Category(name='Buffet')
-        ]
+        categories = [Category(name=name) for name in CATEGORY_NAMES]
         db.session.add_all(categories)
         db.session.commit()
     # ---------------------------
@@ -119,7 +103,8 @@ def seed():
                 manager=r['manager'],  # Use the manager relationship
                 categories=r['categories'],
                 latitude=lat,
-                longitude=lon
+                longitude=lon,
+                geocode_status='done' if lat is not None else 'failed'
             )
             db.session.add(restaurant)
             # Optional: Log if geocoding was unsuccessful
@@ -206,5 +191,195 @@ def seed():
         db.session.commit()
         print("Database seeded successfully!")
 
+
+def generate(restaurants=100, categories=20, frontend_users=1000, reservations=5000, rng_seed=0, chunk_size=50000):
+    """
+    Fills the empty database of the current app context with a synthetic dataset
+    of the given size. The large tables are written by insert_rows() in chunks of
+    chunk_size rows, the others with Core executemany inserts. Nothing is geocoded (coordinates come from the offline geocoder) and every
+    manager shares one password hash. The same rng_seed always produces the same
+    rows. A reservation that would overbook its slot is stored as declined. Slot
+    occupancy and the stats rollup are tallied while generating and written at the
+    end, as rebuild_occupancy() and rebuild_rollup() would compute them. The search
+    index is rebuilt last.
+    """
+    rng = random.Random(rng_seed)
+    geocoder = OfflineGeocoder(current_app.config)
+    password_hash = generate_password_hash('password123')  # Hashing is slow: every manager shares one hash
+    now = datetime.utcnow()
+    connection = db.session.connection()
+
+    connection.execute(insert(Category.__table__), [
+        {'id': i, 'name': CATEGORY_NAMES[i - 1] if i <= len(CATEGORY_NAMES) else f'Category {i}', 'updated_at': now}
+        for i in range(1, categories + 1)
+    ])
+    connection.execute(insert(User.__table__), [
+        {'id': i, 'email': f'manager{i}@example.com', 'name': f'Manager {i}', 'password_hash': password_hash}
+        for i in range(1, restaurants + 1)
+    ])
+    restaurant_rows, category_links = [], []
+    for i in range(1, restaurants + 1):
+        address = f'Via Generata {i}, 39100 Bolzano BZ, Italy'
+        latitude, longitude = geocoder.geocode(address)
+        restaurant_rows.append({
+            'id': i, 'name': f'Restaurant {i}', 'address': address, 'phone_number': f'0471{i:06d}',
+            'description': 'Generated for load testing.', 'manager_id': i, 'latitude': latitude, 'longitude': longitude,
+            'geocode_status': 'done', 'geocode_attempts': 0, 'geocode_next_attempt_at': None,
+            'seat_capacity': 40, 'slot_minutes': 30, 'dining_minutes': 90, 'updated_at': now, 'version': 1,
+        })
+        if categories:
+            category_links += [{'restaurant_id': i, 'category_id': category_id}
+                               for category_id in rng.sample(range(1, categories + 1), min(categories, rng.randint(1, 3)))]
+    connection.execute(insert(Restaurant.__table__), restaurant_rows)
+    if category_links:
+        connection.execute(insert(restaurant_categories), category_links)
+    insert_rows(connection, FrontendUser.__table__, ('id', 'user_id', 'email'), [
+        (i, f'user_{i:06d}', f'guest{i}@example.com') for i in range(1, frontend_users + 1)
+    ])
+
+    generator = ReservationGenerator(rng, restaurant_rows, frontend_users, now)
+    chunk = []
+    for row in generator.rows(reservations):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            insert_rows(connection, Reservation.__table__, RESERVATION_COLUMNS, chunk)
+            chunk = []
+    insert_rows(connection, Reservation.__table__, RESERVATION_COLUMNS, chunk)
+
+    insert_rows(connection, SlotOccupancy.__table__, ('restaurant_id', 'slot_start', 'covers'), [
+        (restaurant_id, generator.moment(day * 1440 + minutes), covers)
+        for (restaurant_id, day, minutes), covers in generator.occupancy.items()
+    ])
+    insert_rows(connection, ReservationHourlyStat.__table__,
+                ('restaurant_id', 'hour_start', 'status', 'party_size', 'reservations'), [
+        (restaurant_id, generator.moment(day * 1440 + hour * 60), status, party_size, count)
+        for (restaurant_id, day, hour, status, party_size), count in generator.rollup.items()
+    ])
+    db.session.commit()
+    rebuild_index()  # Core inserts bypass the session hooks that keep the search index in sync
+
+
+def insert_rows(connection, table, columns, rows):
+    """
+    Insert tuples of values for columns with one executemany on the DBAPI cursor.
+    This skips SQLAlchemy's per-value parameter processing, which took most of
+    the load time, so values must already be in their stored form: DateTime
+    values as DATETIME_FORMAT strings, and no column defaults are applied.
+    """
+    if not rows:
+        return
+    statement = insert(table).compile(dialect=connection.dialect, column_keys=columns)
+    if statement.positional:
+        order = [columns.index(name) for name in statement.positiontup]
+        if order != list(range(len(columns))):
+            rows = [[row[i] for i in order] for row in rows]
+    else:
+        rows = [dict(zip(columns, row)) for row in rows]
+    cursor = connection.connection.cursor()
+    try:
+        cursor.executemany(str(statement), rows)
+    finally:
+        cursor.close()
+
+
+class ReservationGenerator:
+    """
+    Reservation rows (tuples of RESERVATION_COLUMNS) spread over the last 30 and the
+    next 60 days, never overbooking a slot. Keeps the per-slot covers and the hourly
+    rollup of the rows it made, keyed by whole days and minutes from the first day.
+    """
+
+    def __init__(self, rng, restaurant_rows, frontend_users, now):
+        self.rng = rng
+        self.restaurant_rows = restaurant_rows
+        self.frontend_users = frontend_users
+        self.now = now.strftime(DATETIME_FORMAT)
+        self.first_day = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=30)
+        self.occupancy = defaultdict(int)  # (restaurant_id, day, minutes) -> covers
+        self.rollup = defaultdict(int)  # (restaurant_id, day, hour, status, party_size) -> reservations
+        self._slot_minutes = {}
+        self._moments = {}
+
+    def moment(self, minutes):
+        """The moment minutes after the first day began, as a DATETIME_FORMAT string (cached)."""
+        text = self._moments.get(minutes)
+        if text is None:
+            text = self._moments[minutes] = (self.first_day + timedelta(minutes=minutes)).strftime(DATETIME_FORMAT)
+        return text
+
+    def occupied_minutes(self, restaurant, minutes):
+        """Start minutes of the slots taken by a reservation at minutes past midnight (cached occupied_slots)."""
+        key = (restaurant['slot_minutes'], restaurant['dining_minutes'], minutes)
+        if key not in self._slot_minutes:
+            start = self.first_day + timedelta(minutes=minutes)
+            self._slot_minutes[key] = [int((slot - self.first_day).total_seconds()) // 60 for slot in occupied_slots(
+                start, restaurant['slot_minutes'], restaurant['dining_minutes'])]
+        return self._slot_minutes[key]
+
+    def rows(self, count):
+        # Runs once per row: everything used in the loop is bound to a local first
+        random, restaurant_rows, occupancy, rollup = self.rng.random, self.restaurant_rows, self.occupancy, self.rollup
+        moment, occupied_minutes, frontend_users, now = self.moment, self.occupied_minutes, self.frontend_users, self.now
+        restaurant_count = len(restaurant_rows)
+        statuses = self.rng.choices(list(STATUS_WEIGHTS), list(STATUS_WEIGHTS.values()), k=count)
+        for i, status in enumerate(statuses, 1):
+            restaurant = restaurant_rows[int(random() * restaurant_count)]
+            restaurant_id = restaurant['id']
+            day, minutes = int(random() * 91), 720 + 30 * int(random() * 20)
+            person_count = 1 + int(random() * 6)
+            if status in OCCUPYING_STATUSES:
+                slots = [(restaurant_id, day, slot) for slot in occupied_minutes(restaurant, minutes)]
+                free = restaurant['seat_capacity'] - person_count
+                for slot in slots:
+                    if occupancy[slot] > free:
+                        status = 'declined'
+                        break
+                else:
+                    for slot in slots:
+                        occupancy[slot] += person_count
+            rollup[(restaurant_id, day, minutes // 60, status, person_count)] += 1
+            starts_at = day * 1440 + minutes
+            yield (
+                i, moment(starts_at), moment(starts_at - 60 * (1 + int(random() * 336))),
+                person_count, restaurant_id, f'Customer {i}', status,
+                1 + int(random() * frontend_users) if frontend_users else None,
+                now, 1,
+            )
+
+
+def bulk_seed(app, restaurants, categories, frontend_users, reservations, rng_seed):
+    """Replaces the data with a generated dataset; indexes are built once after loading instead of on every insert."""
+    with app.app_context():
+        tables = [table for table in db.metadata.sorted_tables if table.name != 'geocode_cache']
+        db.metadata.drop_all(db.engine, tables=tables)
+        db.create_all()
+        indexes = [index for table in tables for index in table.indexes]
+        with db.engine.begin() as connection:
+            for index in indexes:
+                index.drop(connection)
+
+        started = time.perf_counter()
+        generate(restaurants, categories, frontend_users, reservations, rng_seed)
+        loaded = time.perf_counter()
+        with db.engine.begin() as connection:
+            for index in indexes:
+                index.create(connection)
+        print(f'Seeded {restaurants} restaurants, {frontend_users} frontend users and {reservations} reservations '
+              f'in {loaded - started:.1f}s, indexed in {time.perf_counter() - loaded:.1f}s.')
+
+
 if __name__ == '__main__':
-    seed()
+    parser = argparse.ArgumentParser(description='Seed the database with demo data, or a large generated dataset.')
+    parser.add_argument('--bulk', action='store_true', help='generate a synthetic dataset of the sizes below')
+    parser.add_argument('--restaurants', type=int, default=1000)
+    parser.add_argument('--categories', type=int, default=20)
+    parser.add_argument('--users', type=int, default=100000, help='frontend users')
+    parser.add_argument('--reservations', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=0, help='RNG seed; the same seed generates the same rows')
+    args = parser.parse_args()
+
+    # Set GEOCODER_BACKEND=offline to seed the demo data without calling Nominatim
+    if args.bulk:
+        bulk_seed(create_app(), args.restaurants, args.categories, args.users, args.reservations, args.seed)
+    else:
+        seed(create_app())
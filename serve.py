@@ -0,0 +1,73 @@
+# serve.py
+#
+# Runs the app under one of the supported serving modes:
+#
+#   python serve.py --mode sync     # Werkzeug, one OS thread per request (what `flask run` does)
+#   python serve.py --mode gevent   # gevent WSGI server, one greenlet per request      (pip install gevent)
+#   python serve.py --mode asgi     # uvicorn event loop in front of the WSGI app        (pip install uvicorn a2wsgi)
+#
+# In gevent mode every blocking call (sockets, sleeps, locks, the SQLAlchemy pool)
+# yields to other requests, so a process keeps thousands of slow clients and idle
+# event streams open at the cost of a greenlet each. In asgi mode uvicorn handles
+# connections and slow clients on its event loop, and a2wsgi runs each request on
+# a pool of --threads threads. An open event stream holds one of those threads.
+
+import argparse
+import importlib.util
+import sys
+
+MODES = ('sync', 'gevent', 'asgi')
+REQUIREMENTS = {'sync': (), 'gevent': ('gevent',), 'asgi': ('uvicorn', 'a2wsgi')}
+
+
+def missing_requirements(mode):
+    return [name for name in REQUIREMENTS[mode] if importlib.util.find_spec(name) is None]
+
+
+def prepare(mode):
+    """Must run before the app is imported: gevent swaps blocking stdlib calls for cooperative ones."""
+    if mode == 'gevent':
+        from gevent import monkey
+        monkey.patch_all()
+
+
+def run(app, mode, host, port, concurrency, threads):
+    if mode == 'sync':
+        from werkzeug.serving import run_simple
+        run_simple(host, port, app, threaded=True)
+    elif mode == 'gevent':
+        from gevent.pool import Pool
+        from gevent.pywsgi import WSGIServer
+        WSGIServer((host, port), app, spawn=Pool(concurrency), log=None).serve_forever()
+    elif mode == 'asgi':
+        import uvicorn
+        from a2wsgi import WSGIMiddleware
+        uvicorn.run(WSGIMiddleware(app, workers=threads), host=host, port=port, limit_concurrency=concurrency,
+                    log_level='warning')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the restaurant reservation app.')
+    parser.add_argument('--mode', choices=MODES, default='sync')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=1000, help='greenlets (gevent) or open connections (asgi)')
+    parser.add_argument('--threads', type=int, default=100, help='threads running requests and event streams (asgi)')
+    parser.add_argument('--config', help='config class as module:Class (default: the APP_CONFIG profile)')
+    args = parser.parse_args()
+
+    missing = missing_requirements(args.mode)
+    if missing:
+        print(f'{args.mode} mode needs: pip install {" ".join(missing)}', file=sys.stderr)
+        return 1
+
+    prepare(args.mode)
+    from werkzeug.utils import import_string
+    from app import create_app
+    app = create_app(import_string(args.config) if args.config else None)
+    run(app, args.mode, args.host, args.port, args.concurrency, args.threads)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,56 @@
+# tests/test_concurrent_booking.py
+#
+# Fails when concurrent bookings can overbook a slot, or when the booking path
+# accepts a time outside the restaurant's opening hours.
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from app import create_app, db
+from app.models import Reservation, SlotOccupancy
+from benchmarks.concurrent_booking import SLOT_DATE, SLOT_TIME, make_config, setup
+
+CAPACITY = 40
+PARTY_SIZE = 2
+THREADS = 8
+BOOKINGS_PER_THREAD = 20
+
+
+def booking(number, time=SLOT_TIME):
+    return {
+        'restaurant_id': 1, 'name': f'Guest {number}', 'date': SLOT_DATE, 'time': time,
+        'number_of_people': PARTY_SIZE, 'timestamp': '2030-05-01T12:00:00Z', 'user_id': f'user_{number % 10}',
+    }
+
+
+def test_concurrent_bookings_never_overbook(tmp_path):
+    path = str(tmp_path / 'booking.db')
+    setup(path, CAPACITY)
+    app = create_app(make_config(path))
+
+    def book_many(thread):
+        client = app.test_client()
+        statuses = []
+        for i in range(BOOKINGS_PER_THREAD):
+            payload = booking(thread * BOOKINGS_PER_THREAD + i)
+            statuses.append(client.post('/api/reservations', json=payload, headers={'Idempotency-Key': payload['name']}).status_code)
+        return statuses
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        statuses = Counter(status for statuses in pool.map(book_many, range(THREADS)) for status in statuses)
+
+    booked = CAPACITY // PARTY_SIZE
+    assert statuses == {201: booked, 409: THREADS * BOOKINGS_PER_THREAD - booked}
+    with app.app_context():
+        assert db.session.query(Reservation).count() == booked
+        assert set(db.session.scalars(db.select(SlotOccupancy.covers))) == {CAPACITY}
+
+
+def test_booking_outside_opening_hours_is_rejected(tmp_path):
+    path = str(tmp_path / 'booking.db')
+    setup(path, CAPACITY)
+    client = create_app(make_config(path)).test_client()
+
+    # Default hours are 11:00-23:00 and a meal takes 90 minutes
+    for time in ('10:30', '22:00'):
+        assert client.post('/api/reservations', json=booking(1, time)).status_code == 400
+    assert client.post('/api/reservations', json=booking(1, '21:30')).status_code == 201
@@ -0,0 +1,29 @@
+# tests/test_query_counts.py
+#
+# Fails when a JSON endpoint starts issuing more SQL statements, or when its
+# statement count grows with the number of rows (an N+1 coming back).
+
+import pytest
+from app import create_app, db
+from benchmarks.query_counts import EXPECTED_MAX_QUERIES, populate, count_queries
+from config import TestingConfig
+
+
+def make_app(size):
+    app = create_app(TestingConfig)
+    with app.app_context():
+        db.create_all()
+        populate(size)
+    return app
+
+
+@pytest.fixture(scope='module')
+def apps():
+    return make_app(5), make_app(50)
+
+
+@pytest.mark.parametrize('url', EXPECTED_MAX_QUERIES)
+def test_query_count_is_bounded(apps, url):
+    small, large = (count_queries(app, url) for app in apps)
+    assert large <= EXPECTED_MAX_QUERIES[url], f'{url} ran {large} statements, budget {EXPECTED_MAX_QUERIES[url]}'
+    assert small == large, f'{url} ran {small} statements for 5 restaurants but {large} for 50'